@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+PediZone CRM - Bakım Script'i
+Türetilmiş koleksiyonları (rollup, müşteri bakiyeleri vb.) yeniden hesaplar ve veri taşıma işlemlerini çalıştırır.
+"""
+
+import asyncio
+import sys
+
+from server import (
+    client, rebuild_sales_rollups, rebuild_customer_balances, migrate_inline_blobs, ensure_indexes, check_indexes
+)
+
+async def run_rebuild_rollups():
+    """sales_rollups koleksiyonunu sales/collections'tan yeniden oluştur"""
+    try:
+        count = await rebuild_sales_rollups()
+        print(f"✅ Satış rollup'ları yeniden oluşturuldu: {count} kayıt")
+        return True
+    except Exception as e:
+        print(f"❌ Hata: {e}")
+        return False
+    finally:
+        client.close()
+
+async def run_rebuild_balances():
+    """customer_balances koleksiyonunu sales/collections'tan yeniden hesapla (mutabakat)"""
+    try:
+        count = await rebuild_customer_balances()
+        print(f"✅ Müşteri bakiyeleri yeniden hesaplandı: {count} kayıt")
+        return True
+    except Exception as e:
+        print(f"❌ Hata: {e}")
+        return False
+    finally:
+        client.close()
+
+async def run_migrate_blobs():
+    """Ziyaret/ürün/doküman dokümanlarındaki inline base64 içerikleri blob deposuna taşı"""
+    try:
+        count = await migrate_inline_blobs()
+        print(f"✅ Inline içerikler blob deposuna taşındı: {count} kayıt")
+        return True
+    except Exception as e:
+        print(f"❌ Hata: {e}")
+        return False
+    finally:
+        client.close()
+
+async def run_check_indexes():
+    """Indexleri INDEX_SPEC'e göre oluştur ve eksik/tanım dışı/kullanılmayan indexleri listele"""
+    try:
+        await ensure_indexes()
+        report = await check_indexes()
+        for name, result in report.items():
+            problems = {kind: names for kind, names in result.items() if names}
+            status = "✅" if not problems else "⚠️"
+            details = "; ".join(f"{kind}: {', '.join(names)}" for kind, names in problems.items())
+            print(f"{status} {name}{' - ' + details if details else ''}")
+        return True
+    except Exception as e:
+        print(f"❌ Hata: {e}")
+        return False
+    finally:
+        client.close()
+
+COMMANDS = {
+    "rebuild-rollups": run_rebuild_rollups,
+    "rebuild-balances": run_rebuild_balances,
+    "migrate-blobs": run_migrate_blobs,
+    "check-indexes": run_check_indexes,
+}
+
+async def main():
+    """Komut satırı girişi"""
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"Kullanım: python maintenance.py [{'|'.join(COMMANDS)}]")
+        return False
+    return await COMMANDS[sys.argv[1]]()
+
+if __name__ == "__main__":
+    ok = asyncio.run(main())
+    sys.exit(0 if ok else 1)
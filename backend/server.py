@@ -3,24 +3,44 @@ PediZone CRM Backend - Güvenlik Odaklı Versiyon
 Güvenlik iyileştirmeleri uygulandı.
 """
 
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request
+import time
+BOOT_STARTED = time.perf_counter()  # Başlangıç süresi raporu (import'lar dahil)
+
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Query, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.background import BackgroundTask
+from fastapi.responses import StreamingResponse, Response, ORJSONResponse
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import IndexModel, UpdateOne, ReplaceOne, DeleteMany, CursorType
+from pymongo.errors import DuplicateKeyError, BulkWriteError, CollectionInvalid
 import os
 import sys
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr, field_validator
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, field_validator, TypeAdapter, create_model, ValidationError
+from pydantic_core import PydanticUndefined
+from typing import List, Optional, Dict, Any, Generic, TypeVar, Union, Tuple
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from passlib.context import CryptContext
 import jwt
 import re
-from collections import defaultdict
-import time
+import asyncio
+import base64
+import json
+import io
+import hashlib
+import binascii
+import functools
+import heapq
+import math
+import threading
+import unicodedata
+from urllib.parse import quote
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -57,6 +77,65 @@ JWT_SECRET = os.environ.get('JWT_SECRET')
 ALGORITHM = "HS256"
 TOKEN_EXPIRE_HOURS = 1
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'development')
+# Bellek içi cache'ler worker başınadır. Yazma sonrası temizlik sadece yazmayı yapan worker'da olur;
+# diğer worker'lardaki bayatlık üst sınırı her ayarın yanında belirtilmiştir.
+# Dashboard/rapor yanıtları: diğer worker'lar en fazla bu süre kadar eski toplam gösterebilir
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '30'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+# Kimliği doğrulanmış kullanıcı: devre dışı bırakma / rol değişikliği diğer worker'larda en geç bu sürede etkili olur
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '15'))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '2048'))
+# Bölge ekip listeleri db.cache_versions ile worker'lar arası geçersiz kılınır (REFERENCE_CACHE_CHECK_SECONDS
+# gecikmeyle); TTL sadece sayacı atlayan değişiklikler (ör. doğrudan Mongo'dan düzeltme) için üst sınır
+TEAM_CACHE_TTL_SECONDS = float(os.environ.get('TEAM_CACHE_TTL_SECONDS', '300'))
+# Kapanmış (geçmiş) ayların analitik satırları; geriye tarihli yazmalarda ilgili ay temizlenir
+PERIOD_CACHE_TTL_SECONDS = float(os.environ.get('PERIOD_CACHE_TTL_SECONDS', '3600'))
+# Offline senkronizasyonda tek istekte kabul edilen toplam kayıt sayısı
+SYNC_BATCH_MAX_ITEMS = int(os.environ.get('SYNC_BATCH_MAX_ITEMS', '500'))
+# Idempotency-Key kayıtlarının saklanma süresi (Mongo TTL index'i)
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+# İşlenmekte olan Idempotency-Key kilidi; worker ölürse bu süreden sonra yeniden deneme kaydı devralır
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '30'))
+# Silme kayıtları (tombstone) bu süre saklanır; daha eski sync token'ları tam senkronizasyona döner
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', '30'))
+# Sync token'ı son görülen kayıttan en fazla bu kadar geride tutulur: yazma anı ile commit arasındaki
+# kayıtlar kaçırılmaz, bu penceredeki kayıtlar bir sonraki senkronizasyonda tekrar gelebilir
+SYNC_SAFETY_SECONDS = int(os.environ.get('SYNC_SAFETY_SECONDS', '5'))
+# Canlı dashboard (SSE): worker başına abonelik limiti, abone başına bekleyen olay kuyruğu,
+# bağlantıyı canlı tutan yorum satırı aralığı ve sapmayı sınırlayan tam snapshot aralığı
+LIVE_MAX_CONNECTIONS = int(os.environ.get('LIVE_MAX_CONNECTIONS', '200'))
+LIVE_QUEUE_SIZE = int(os.environ.get('LIVE_QUEUE_SIZE', '64'))
+LIVE_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_HEARTBEAT_SECONDS', '15'))
+LIVE_SNAPSHOT_SECONDS = float(os.environ.get('LIVE_SNAPSHOT_SECONDS', '300'))
+# memory: olaylar sadece yazmayı yapan worker'ın abonelerine; mongo: capped live_events koleksiyonu
+# üzerinden tüm worker/makinelere
+LIVE_EVENTS_BACKEND = os.environ.get('LIVE_EVENTS_BACKEND', 'memory')
+LIVE_EVENTS_CAPPED_BYTES = int(os.environ.get('LIVE_EVENTS_CAPPED_BYTES', str(4 * 1024 * 1024)))
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+REPORT_STREAM_BATCH_SIZE = 500
+# Kendi koleksiyonlarımızdan gelen liste verisini Pydantic doğrulaması olmadan orjson ile serileştir
+FAST_SERIALIZATION = os.environ.get('FAST_SERIALIZATION', 'true').lower() in ('1', 'true', 'yes')
+# gridfs: Mongo içinde (varsayılan); local: BLOB_LOCAL_DIR altında dosya sistemi
+BLOB_BACKEND = os.environ.get('BLOB_BACKEND', 'gridfs')
+BLOB_LOCAL_DIR = Path(os.environ.get('BLOB_LOCAL_DIR', str(ROOT_DIR / 'blobs')))
+BLOB_CHUNK_SIZE = 256 * 1024
+IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', '1600'))
+IMAGE_THUMBNAIL_DIMENSION = int(os.environ.get('IMAGE_THUMBNAIL_DIMENSION', '320'))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '82'))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '1'))
+# Çözülmeden reddedilecek piksel sayısı; RGB'ye açılan görsel piksel başına ~3-4 bayt tutar (50 MP ≈ 200 MB)
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', str(50_000_000)))
+# Diğer worker'ların yazmalarını görmek için snapshot versiyonu en fazla bu sıklıkla Mongo'dan kontrol edilir
+REFERENCE_CACHE_CHECK_SECONDS = float(os.environ.get('REFERENCE_CACHE_CHECK_SECONDS', '5'))
+# check_indexes raporu ($indexStats) bu aralıkla, worker'lar arasında tek sefer üretilir; 0 kapatır.
+# İlk rapor açılıştan bir aralık sonra: yeni oluşturulan indexlerin kullanım sayaçları boştur
+INDEX_CHECK_INTERVAL_SECONDS = float(os.environ.get('INDEX_CHECK_INTERVAL_SECONDS', '86400'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+# memory: process başına; sqlite: aynı makinedeki worker'lar arasında paylaşılır
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH', '/tmp/pedizone_rate_limits.db')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
 
 # JWT Secret için fallback sadece development'da
 if not JWT_SECRET:
@@ -97,28 +176,215 @@ except Exception as e:
 
 # ============ SECURITY ============
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt CPU yoğun ve GIL'i bırakıyor - event loop'u bloklamaması için ayrı thread havuzunda çalışır
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 security = HTTPBearer()
 
-# Simple in-memory rate limiter for login attempts
+# Login denemeleri için GCRA tabanlı rate limiter.
+# Anahtar başına tek bir sayı (TAT - theoretical arrival time) tutulur; bellek anahtar sayısıyla sınırlı.
+
+class RateLimitBackend:
+    """Rate limiter durum deposu arayüzü - anahtar başına TAT saklar"""
+    blocking = False  # True ise çağrılar thread havuzunda yapılır (event loop bloklanmaz)
+    
+    def get_tat(self, key: str) -> float:
+        raise NotImplementedError
+    
+    def advance_tat(self, key: str, now: float, interval: float) -> float:
+        """Atomik olarak TAT = max(TAT, now) + interval"""
+        raise NotImplementedError
+    
+    def clear(self, key: str):
+        raise NotImplementedError
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Tek process için bellek içi depo - süresi geçmiş anahtarlar tahliye edilir"""
+    def __init__(self, max_keys: int = 10000, sweep_interval: float = 60.0):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self.last_sweep = 0.0
+        self.tats: Dict[str, float] = {}
+    
+    def get_tat(self, key: str) -> float:
+        return self.tats.get(key, 0.0)
+    
+    def advance_tat(self, key: str, now: float, interval: float) -> float:
+        tat = max(self.tats.get(key, 0.0), now) + interval
+        self.tats[key] = tat
+        self.evict(now)
+        return tat
+    
+    def clear(self, key: str):
+        self.tats.pop(key, None)
+    
+    def evict(self, now: float):
+        """TAT'i geçmişte kalanlar bilgi taşımaz, önce onlar atılır. Hâlâ doluysa en erken dolacak
+        TAT'ler gider: aktif kilitler, rastgele kullanıcı adlarıyla depo doldurularak silinemez."""
+        if len(self.tats) <= self.max_keys and now - self.last_sweep < self.sweep_interval:
+            return
+        self.last_sweep = now
+        for key in [key for key, tat in self.tats.items() if tat <= now]:
+            del self.tats[key]
+        overflow = len(self.tats) - self.max_keys
+        if overflow > 0:
+            # Toplu atım: dolu depoda her yeni anahtar tam taramaya yol açmasın
+            for key in heapq.nsmallest(max(overflow, self.max_keys // 10), self.tats, key=self.tats.__getitem__):
+                del self.tats[key]
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Aynı makinedeki uvicorn worker'ları arasında paylaşılan SQLite deposu"""
+    blocking = True  # Dosya kilidinde busy timeout'a (1 sn) kadar bekleyebilir
+    
+    def __init__(self, path: str, sweep_interval: float = 60.0):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self.last_sweep = 0.0
+        self.lock = threading.Lock()  # Bağlantı thread havuzundaki çağrılar arasında paylaşılır
+        import sqlite3  # Sadece RATE_LIMIT_BACKEND=sqlite iken gerekli
+        self.conn = sqlite3.connect(path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+    
+    def get_tat(self, key: str) -> float:
+        with self.lock:
+            row = self.conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0.0
+    
+    def advance_tat(self, key: str, now: float, interval: float) -> float:
+        with self.lock:
+            row = self.conn.execute(
+                "INSERT INTO rate_limits (key, tat) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tat = MAX(tat, ?) + ? RETURNING tat",
+                (key, now + interval, now, interval)
+            ).fetchone()
+            if now - self.last_sweep > self.sweep_interval:
+                self.last_sweep = now
+                self.conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+        return row[0]
+    
+    def clear(self, key: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
 class RateLimiter:
-    def __init__(self, max_attempts: int = 5, window_seconds: int = 300):
+    """GCRA: window_seconds içinde en fazla max_attempts deneme, sonra her window/max_attempts'ta bir hak"""
+    def __init__(self, max_attempts: int = 5, window_seconds: int = 300, backend: Optional[RateLimitBackend] = None):
         self.max_attempts = max_attempts
         self.window_seconds = window_seconds
-        self.attempts = defaultdict(list)
+        self.interval = window_seconds / max_attempts
+        self.backend = backend or MemoryRateLimitBackend()
+    
+    async def call_backend(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+    
+    async def retry_after(self, key: str) -> int:
+        """Bir sonraki denemeye kalan saniye (yukarı yuvarlanmış); 0 ise deneme serbest"""
+        tat = await self.call_backend(self.backend.get_tat, key)
+        wait = tat - time.time() - (self.window_seconds - self.interval)
+        return math.ceil(wait) if wait > 1e-6 else 0
+    
+    async def is_rate_limited(self, key: str) -> bool:
+        return await self.retry_after(key) > 0
+    
+    async def record_attempt(self, key: str):
+        await self.call_backend(self.backend.advance_tat, key, time.time(), self.interval)
+    
+    async def reset(self, key: str):
+        await self.call_backend(self.backend.clear, key)
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    """RATE_LIMIT_BACKEND ayarına göre depo seç"""
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteRateLimitBackend(RATE_LIMIT_SQLITE_PATH)
+    return MemoryRateLimitBackend(max_keys=RATE_LIMIT_MAX_KEYS)
+
+login_rate_limiter = RateLimiter(max_attempts=5, window_seconds=300, backend=create_rate_limit_backend())  # 5 dakikada 5 deneme
+
+# ============ RESPONSE CACHE ============
+
+class TTLCache:
+    """Boyutu sınırlı, TTL'li, LRU tahliyeli in-memory cache"""
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def discard(self, key):
+        self.entries.pop(key, None)
     
-    def is_rate_limited(self, key: str) -> bool:
-        now = time.time()
-        # Eski denemeleri temizle
-        self.attempts[key] = [t for t in self.attempts[key] if now - t < self.window_seconds]
-        return len(self.attempts[key]) >= self.max_attempts
+    def clear(self):
+        self.entries.clear()
     
-    def record_attempt(self, key: str):
-        self.attempts[key].append(time.time())
+    def invalidate(self, predicate):
+        """predicate(key) True dönen tüm kayıtları sil"""
+        for key in [k for k in self.entries if predicate(k)]:
+            del self.entries[key]
     
-    def reset(self, key: str):
-        self.attempts[key] = []
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+# Anahtar: (endpoint, rol, kapsam) - kapsam salesperson için user_id, regional_manager için region_id
+response_cache = TTLCache(RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES)
+
+# Kimliği doğrulanmış kullanıcı kayıtları (password_hash HARİÇ), anahtar: user_id
+user_cache = TTLCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
 
-login_rate_limiter = RateLimiter(max_attempts=5, window_seconds=300)  # 5 dakikada 5 deneme
+# Bölge -> plasiyer id listesi, anahtar: region_id
+team_cache = TTLCache(TEAM_CACHE_TTL_SECONDS, 1024)
+
+# Anahtar: (endpoint, rol, kapsam, kaynak, ay) - sadece kapanmış aylar
+period_cache = TTLCache(PERIOD_CACHE_TTL_SECONDS, 4096)
+
+def response_cache_key(endpoint: str, user: dict) -> tuple:
+    """Kullanıcının rolüne göre cache anahtarı"""
+    role = user["role"]
+    if role == "admin":
+        return (endpoint, role, "*")
+    if role == "regional_manager":
+        return (endpoint, role, user.get("region_id"))
+    return (endpoint, role, user["id"])
+
+def invalidate_response_cache(salesperson_id: Optional[str] = None, region_ids: tuple = (), months: Optional[tuple] = ()):
+    """Bir plasiyerin yazma işleminden etkilenen cache kayıtlarını temizle
+    
+    months: yazmanın düştüğü aylar (period_cache); None ise kapsamların tüm ayları
+    """
+    scopes = {("admin", "*"), ("salesperson", salesperson_id)}
+    scopes.update(("regional_manager", region_id) for region_id in region_ids if region_id)
+    response_cache.invalidate(lambda key: key[1:] in scopes)
+    if months is None:
+        period_cache.invalidate(lambda key: key[1:3] in scopes)
+    elif months:
+        period_cache.invalidate(lambda key: key[1:3] in scopes and key[-1] in months)
 
 # ============ VALIDATION HELPERS ============
 def validate_username(username: str) -> str:
@@ -155,6 +421,7 @@ class User(BaseModel):
     password_hash: str
     active: bool = True
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class UserCreate(BaseModel):
     username: str
@@ -224,6 +491,7 @@ class UserResponse(BaseModel):
     region_id: Optional[str] = None
     active: bool
     created_at: str
+    updated_at: Optional[str] = None
 
 class LoginRequest(BaseModel):
     username: str
@@ -241,6 +509,7 @@ class Region(BaseModel):
     description: Optional[str] = None
     manager_id: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class RegionCreate(BaseModel):
     name: str
@@ -265,6 +534,7 @@ class Customer(BaseModel):
     tax_number: Optional[str] = None
     notes: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class CustomerCreate(BaseModel):
     name: str
@@ -308,8 +578,11 @@ class Product(BaseModel):
     price_11_24: Optional[float] = None
     unit: str = "adet"
     photo_base64: Optional[str] = None
+    photo_blob: Optional[str] = None
+    photo_thumb_blob: Optional[str] = None
     active: bool = True
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class ProductCreate(BaseModel):
     code: str
@@ -346,8 +619,11 @@ class Visit(BaseModel):
     notes: Optional[str] = None
     location: Optional[Dict[str, float]] = None
     photo_base64: Optional[str] = None
+    photo_blob: Optional[str] = None
+    photo_thumb_blob: Optional[str] = None
     status: str = "gorusuldu"
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class VisitCreate(BaseModel):
     customer_id: str
@@ -383,6 +659,7 @@ class Sale(BaseModel):
     total_amount: float
     notes: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class SaleCreate(BaseModel):
     customer_id: str
@@ -401,6 +678,7 @@ class Collection(BaseModel):
     payment_method: str
     notes: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
 class CollectionCreate(BaseModel):
     customer_id: str
@@ -433,6 +711,7 @@ class Document(BaseModel):
     type: str
     file_name: Optional[str] = None
     file_base64: Optional[str] = None
+    file_blob: Optional[str] = None
     file_type: Optional[str] = None
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
@@ -453,6 +732,19 @@ class DocumentCreate(BaseModel):
             raise ValueError(f"Geçersiz doküman tipi")
         return v
 
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """Cursor tabanlı sayfalama yanıtı - next_cursor None ise son sayfa"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+class SyncBatch(BaseModel):
+    """Offline kayıtların toplu gönderimi - kayıtlar tek tek doğrulanır, hatalılar diğerlerini engellemez"""
+    visits: List[Dict[str, Any]] = []
+    sales: List[Dict[str, Any]] = []
+    collections: List[Dict[str, Any]] = []
+
 # ============ AUTH HELPERS ============
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -466,6 +758,16 @@ def get_password_hash(password: str) -> str:
     """Şifre hashleme"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Şifre doğrulama - bcrypt thread havuzunda, event loop bloklanmaz"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Şifre hashleme - bcrypt thread havuzunda, event loop bloklanmaz"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
 def create_access_token(data: dict) -> str:
     """JWT token oluşturma - exp ve iat dahil"""
     to_encode = data.copy()
@@ -488,69 +790,760 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             logger.warning("Token'da user ID bulunamadı")
             raise HTTPException(status_code=401, detail="Geçersiz kimlik bilgisi")
         
-        # password_hash'i projection'dan hariç tut
-        user = await db.users.find_one(
-            {"id": user_id}, 
-            {"_id": 0, "password_hash": 0}
-        )
+        user = user_cache.get(user_id)
         if user is None:
-            logger.warning(f"Token'daki kullanıcı bulunamadı: {user_id}")
-            raise HTTPException(status_code=401, detail="Kullanıcı bulunamadı")
+            # password_hash'i projection'dan hariç tut
+            user = await db.users.find_one(
+                {"id": user_id}, 
+                {"_id": 0, "password_hash": 0}
+            )
+            if user is None:
+                logger.warning(f"Token'daki kullanıcı bulunamadı: {user_id}")
+                raise HTTPException(status_code=401, detail="Kullanıcı bulunamadı")
+            user_cache.set(user_id, user)
         
         if not user.get("active", True):
             raise HTTPException(status_code=401, detail="Hesap devre dışı")
         
-        return user
+        return dict(user)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Oturum süresi doldu, lütfen tekrar giriş yapın")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Geçersiz kimlik bilgisi")
 
-# ============ DATABASE INITIALIZATION ============
+# ============ QUERY HELPERS ============
+
+async def gather_queries(label: str, **queries) -> Dict[str, Any]:
+    """Birbirinden bağımsız sorguları eşzamanlı çalıştır, süreleri logla
+    
+    Kullanım: results = await gather_queries("etiket", sales=coro1, visits=coro2)
+    """
+    timings = {}
+    
+    async def timed(name, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[name] = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed(name, q) for name, q in queries.items()))
+    total_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        f"Sorgu grubu {label}: {total_ms:.1f}ms ("
+        + ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items()) + ")"
+    )
+    return dict(zip(queries.keys(), results))
+
+# team_cache'in bilinen versiyonu (db.cache_versions "teams") ve son kontrol zamanı
+team_cache_version = {"version": None, "checked_at": 0.0}
+
+async def sync_team_cache():
+    """Başka bir worker kullanıcı yazdıysa yerel ekip cache'ini temizle - en fazla REFERENCE_CACHE_CHECK_SECONDS'ta bir"""
+    if time.monotonic() - team_cache_version["checked_at"] < REFERENCE_CACHE_CHECK_SECONDS:
+        return
+    team_cache_version["checked_at"] = time.monotonic()
+    doc = await db.cache_versions.find_one({"_id": "teams"})
+    version = doc["version"] if doc else 0
+    if version != team_cache_version["version"]:
+        team_cache.clear()
+        team_cache_version["version"] = version
+
+async def invalidate_team_cache():
+    """Kullanıcı yazmasından sonra: versiyonu artır (diğer worker'lar için) ve yerel cache'i temizle"""
+    await db.cache_versions.update_one({"_id": "teams"}, {"$inc": {"version": 1}}, upsert=True)
+    team_cache.clear()
+
+async def get_team_ids(region_id: Optional[str]) -> List[str]:
+    """Bölgedeki plasiyerlerin id listesi - kullanıcı yazmalarında tüm worker'larda temizlenen cache'ten"""
+    await sync_team_cache()
+    team_ids = team_cache.get(region_id)
+    if team_ids is None:
+        team_users = await db.users.find(
+            {"region_id": region_id, "role": "salesperson"}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        team_ids = [u["id"] for u in team_users]
+        team_cache.set(region_id, team_ids)
+    return list(team_ids)
 
-async def ensure_indexes():
-    """Veritabanı indexlerini oluştur"""
+async def report_scope_query(current_user: dict) -> dict:
+    """Rapor sorgularının rol kapsamı: plasiyer kendi kayıtları, bölge müdürü ekibi, admin hepsi"""
+    if current_user["role"] == "salesperson":
+        return {"salesperson_id": current_user["id"]}
+    if current_user["role"] == "regional_manager":
+        team_ids = await get_team_ids(current_user.get("region_id"))
+        return {"salesperson_id": {"$in": team_ids}}
+    return {}
+
+def encode_cursor(doc: dict) -> str:
+    """(created_at, id) çiftinden opak cursor"""
+    raw = json.dumps([doc["created_at"], doc["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
     try:
-        # Users için unique indexler
-        await db.users.create_index("username", unique=True)
-        await db.users.create_index("email", unique=True)
-        await db.users.create_index("id", unique=True)
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, doc_id = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(doc_id, str):
+            raise ValueError
+        return created_at, doc_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz cursor")
+
+class TrustedSerializer:
+    """Model alanlarına projekte edilmiş, kendi koleksiyonlarımızdan gelen dokümanlar için hızlı yol
+    
+    Doğrulama yerine: Mongo projection ile sadece model alanları alınır, eksik alanlara
+    sabit varsayılanlar eklenir ve sonuç doğrudan orjson ile yazılır.
+    fields verilirse (?fields=) projection ve yanıt sadece bu alanlarla sınırlanır.
+    """
+    def __init__(self, model, exclude: tuple = (), fields: Optional[tuple] = None):
+        selected = {
+            name: field for name, field in model.model_fields.items()
+            if name not in exclude and (fields is None or name in fields)
+        }
+        self.fields = fields
+        self.projection = {"_id": 0, **{name: 1 for name in selected}}
+        self.defaults = {
+            name: field.default for name, field in selected.items()
+            if field.default is not PydanticUndefined and field.default_factory is None
+        }
+        # Kısmi yanıt response_model ile uyuşmaz; yavaş yolda kısmi model ile doğrulanır
+        self.partial_adapter = None
+        if fields is not None:
+            partial = create_model(
+                f"{model.__name__}Fields",
+                **{name: (Optional[field.annotation], None) for name, field in selected.items()}
+            )
+            self.partial_adapter = TypeAdapter(List[partial])
+    
+    def prepare(self, docs: list) -> list:
+        if not self.defaults:
+            return docs
+        return [{**self.defaults, **doc} for doc in docs]
+    
+    def render(self, docs: list) -> list:
+        """ORJSONResponse'a verilecek liste: hızlı yolda prepare, kısmi yanıtta kısmi model doğrulaması"""
+        if FAST_SERIALIZATION:
+            return self.prepare(docs)
+        return self.partial_adapter.dump_python(self.partial_adapter.validate_python(docs), mode="json")
+    
+    def projection_with(self, *required: str):
+        """Sunucunun ihtiyaç duyduğu (cursor, toplam vb.) ama istenmemiş alanları da çek
         
-        # Diğer koleksiyonlar için indexler
-        await db.regions.create_index("id", unique=True)
-        await db.customers.create_index("id", unique=True)
-        await db.products.create_index("id", unique=True)
-        await db.products.create_index("code", unique=True)
-        await db.visits.create_index("id", unique=True)
-        await db.sales.create_index("id", unique=True)
-        await db.collections.create_index("id", unique=True)
-        await db.documents.create_index("id", unique=True)
+        Dönüş: (projection, hidden) - hidden alanları yanıt öncesi drop_hidden ile atılır.
+        """
+        hidden = tuple(name for name in required if name not in self.projection)
+        return {**self.projection, **{name: 1 for name in hidden}}, hidden
+
+def drop_hidden(doc: dict, hidden: tuple) -> dict:
+    for name in hidden:
+        doc.pop(name, None)
+    return doc
+
+@functools.lru_cache(maxsize=None)
+def trusted_serializer(model, exclude: tuple = (), fields: Optional[tuple] = None) -> TrustedSerializer:
+    return TrustedSerializer(model, exclude, fields)
+
+def parse_fields(fields: Optional[str], model, exclude: tuple = ()) -> Optional[tuple]:
+    """?fields=id,name,... parametresini doğrula; id her zaman dahil, verilmezse None (tam doküman)"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(name for name in requested if name not in model.model_fields or name in exclude)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Geçersiz alan: {', '.join(unknown)}")
+    return tuple(sorted(requested | {"id"}))
+
+async def find_list_or_page(collection, query: dict, model, limit: Optional[int], cursor: Optional[str], legacy_limit: int, exclude: tuple = (), fields: Optional[str] = None):
+    """limit/cursor verilmezse eski davranış (düz liste), verilirse (created_at, id) üzerinden keyset sayfalama"""
+    serializer = trusted_serializer(model, exclude, parse_fields(fields, model, exclude))
+    # Kısmi yanıtlar response_model doğrulamasından geçemez, her zaman doğrudan yazılır
+    direct = FAST_SERIALIZATION or serializer.fields is not None
+    if limit is None and cursor is None:
+        docs = await collection.find(query, serializer.projection).to_list(legacy_limit)
+        if direct:
+            return ORJSONResponse(serializer.render(docs))
+        return docs
+    
+    limit = limit or DEFAULT_PAGE_SIZE
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": doc_id}}
+        ]}]}
+    
+    projection, hidden = serializer.projection_with("created_at")
+    docs = await collection.find(query, projection).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    items = [drop_hidden(doc, hidden) for doc in docs[:limit]]
+    if direct:
+        return ORJSONResponse({"items": serializer.render(items), "next_cursor": next_cursor})
+    return {"items": items, "next_cursor": next_cursor}
+
+# ============ BLOB STORAGE ============
+# Fotoğraf/dosya içerikleri ana dokümanlarda base64 olarak değil, içerik hash'i (sha256) ile
+# adreslenen blob deposunda tutulur. Ana doküman sadece referansı (photo_blob/file_blob) taşır.
+# Metadata (boyut, content_type) her iki backend için db.blobs koleksiyonundadır.
+
+class BlobStore:
+    """Blob içerik deposu arayüzü"""
+    async def write(self, blob_hash: str, data: bytes, content_type: str):
+        raise NotImplementedError
+    
+    def stream(self, blob_hash: str, start: int = 0, length: Optional[int] = None):
+        """İçeriği start ofsetinden itibaren (en fazla length bayt) BLOB_CHUNK_SIZE parçalar halinde döndüren async iterator"""
+        raise NotImplementedError
+
+class GridFSBlobStore(BlobStore):
+    def __init__(self, database):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name="blobs")
+    
+    async def write(self, blob_hash: str, data: bytes, content_type: str):
+        await self.bucket.upload_from_stream(
+            blob_hash, data, chunk_size_bytes=BLOB_CHUNK_SIZE, metadata={"content_type": content_type}
+        )
+    
+    async def stream(self, blob_hash: str, start: int = 0, length: Optional[int] = None):
+        grid_out = await self.bucket.open_download_stream_by_name(blob_hash)
+        if start:
+            grid_out.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = BLOB_CHUNK_SIZE if remaining is None else min(BLOB_CHUNK_SIZE, remaining)
+            chunk = await grid_out.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: Path):
+        self.root = root
+    
+    def path_for(self, blob_hash: str) -> Path:
+        return self.root / blob_hash[:2] / blob_hash
+    
+    def write_file(self, blob_hash: str, data: bytes):
+        path = self.path_for(blob_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    
+    async def write(self, blob_hash: str, data: bytes, content_type: str):
+        await asyncio.to_thread(self.write_file, blob_hash, data)
+    
+    async def stream(self, blob_hash: str, start: int = 0, length: Optional[int] = None):
+        handle = await asyncio.to_thread(open, self.path_for(blob_hash), "rb")
+        try:
+            if start:
+                handle.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                size = BLOB_CHUNK_SIZE if remaining is None else min(BLOB_CHUNK_SIZE, remaining)
+                chunk = await asyncio.to_thread(handle.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            handle.close()
+
+blob_store: BlobStore = LocalBlobStore(BLOB_LOCAL_DIR) if BLOB_BACKEND == "local" else GridFSBlobStore(db)
+
+def decode_base64_payload(value: str) -> tuple:
+    """base64 veya data URL (data:image/jpeg;base64,...) -> (bytes, content_type)"""
+    content_type = None
+    if value.startswith("data:"):
+        header, _, value = value.partition(",")
+        content_type = header[5:].split(";")[0] or None
+    try:
+        return base64.b64decode(value, validate=True), content_type
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Geçersiz base64 içerik")
+
+async def store_blob(data: bytes, content_type: Optional[str]) -> str:
+    """İçeriği depoya yaz (aynı içerik zaten varsa tekrar yazma), sha256 referansını döndür"""
+    # Çok MB'lık içeriklerin hash'i event loop'u bekletmesin (hashlib büyük girdide GIL'i bırakır)
+    blob_hash = (await asyncio.to_thread(hashlib.sha256, data)).hexdigest()
+    if await db.blobs.find_one({"hash": blob_hash}, {"_id": 1}):
+        return blob_hash
+    content_type = content_type or "application/octet-stream"
+    await blob_store.write(blob_hash, data, content_type)
+    try:
+        await db.blobs.insert_one({
+            "hash": blob_hash,
+            "size": len(data),
+            "content_type": content_type,
+            "backend": BLOB_BACKEND,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        })
+    except Exception as e:
+        # Eşzamanlı aynı içerik yüklemesi - metadata zaten yazılmış
+        if "duplicate key" not in str(e).lower():
+            raise
+    return blob_hash
+
+async def extract_blob(doc: dict, base64_field: str, blob_field: str, content_type: Optional[str] = None):
+    """doc[base64_field] doluysa içeriği blob deposuna taşı, doc[blob_field] referansını ayarla"""
+    value = doc.get(base64_field)
+    if not value:
+        return
+    data, detected_type = await asyncio.to_thread(decode_base64_payload, value)
+    doc[blob_field] = await store_blob(data, content_type or detected_type)
+    doc[base64_field] = None
+
+async def migrate_inline_blobs() -> int:
+    """Eski dokümanlardaki inline base64 içerikleri blob deposuna taşı
+    
+    Fotoğraflar yeni yüklemelerle aynı yoldan (ingest_image) geçer: küçültülür, EXIF/GPS atılır, thumbnail
+    üretilir. Dokümanlar (PDF vb.) olduğu gibi taşınır.
+    """
+    def move_photo(doc: dict):
+        return ingest_image(doc, "photo_base64", "photo_blob", "photo_thumb_blob")
+    
+    def move_document(doc: dict):
+        return extract_blob(doc, "file_base64", "file_blob", doc.get("file_type"))
+    
+    # (koleksiyon, base64 alanı, yazılan blob alanları, ek okunan alanlar, taşıyıcı)
+    targets = (
+        (db.visits, "photo_base64", ("photo_blob", "photo_thumb_blob"), (), move_photo),
+        (db.products, "photo_base64", ("photo_blob", "photo_thumb_blob"), (), move_photo),
+        (db.documents, "file_base64", ("file_blob",), ("file_type",), move_document),
+    )
+    migrated = 0
+    for collection, base64_field, blob_fields, extra_fields, move in targets:
+        cursor = collection.find(
+            {base64_field: {"$nin": [None, ""]}},
+            {"_id": 0, "id": 1, base64_field: 1, **{field: 1 for field in extra_fields}}
+        )
+        async for doc in cursor:
+            try:
+                await move(doc)
+            except HTTPException:
+                logger.warning(f"Geçersiz içerik atlandı: {collection.name}/{doc['id']}")
+                continue
+            await collection.update_one(
+                {"id": doc["id"]},
+                {"$set": {
+                    **{field: doc[field] for field in blob_fields},
+                    base64_field: None,
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                }}
+            )
+            migrated += 1
+    logger.info(f"Inline içerikler blob deposuna taşındı: {migrated} kayıt")
+    return migrated
+
+# ============ IMAGE INGEST ============
+# Yüklenen fotoğraflar ayrı process havuzunda çözülür, EXIF yönü uygulanıp metadata atılır,
+# IMAGE_MAX_DIMENSION'a küçültülür ve liste görünümleri için thumbnail üretilir.
+
+image_executor: Optional[ProcessPoolExecutor] = None
+
+def get_image_executor() -> ProcessPoolExecutor:
+    """Process havuzunu ilk kullanımda oluştur - açılış süresini etkilemez"""
+    global image_executor
+    if image_executor is None:
+        image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return image_executor
+
+def process_image(data: bytes, max_dimension: int, thumbnail_dimension: int, quality: int,
+                  max_pixels: int = IMAGE_MAX_PIXELS) -> dict:
+    """Görseli normalize et: {"image": (bytes, content_type), "thumbnail": (bytes, content_type)}
+    
+    Process havuzunda çalışır; ValueError geçersiz görsel demektir.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            # Boyut başlıktan okunur; piksel verisi load() ile açılmadan önce sınır kontrol edilir
+            width, height = source.size
+            if width * height > max_pixels:
+                raise ValueError(f"Görsel çok büyük: {width}x{height}")
+            # JPEG'i doğrudan hedef boyuta yakın ölçekte çöz (1/2, 1/4, 1/8) - tam çözünürlük belleğe alınmaz
+            source.draft("RGB", (max_dimension, max_dimension))
+            source.load()
+            image = ImageOps.exif_transpose(source)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        # DecompressionBombError OSError değil; MAX_IMAGE_PIXELS'ın 2 katını aşan görseller
+        raise ValueError(f"Geçersiz görsel: {e}")
+    
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    
+    def encode(img) -> tuple:
+        buffer = io.BytesIO()
+        # Yeni dosyaya yazarken EXIF/metadata aktarılmaz
+        if has_alpha:
+            img.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+        img.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue(), "image/jpeg"
+    
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    thumbnail = image.copy()
+    thumbnail.thumbnail((thumbnail_dimension, thumbnail_dimension), Image.LANCZOS)
+    return {"image": encode(image), "thumbnail": encode(thumbnail)}
+
+async def ingest_image(doc: dict, base64_field: str, blob_field: str, thumb_field: str):
+    """doc[base64_field] doluysa görseli işle, ana görsel ve thumbnail blob referanslarını ayarla"""
+    value = doc.get(base64_field)
+    if not value:
+        return
+    data, _ = await asyncio.to_thread(decode_base64_payload, value)
+    loop = asyncio.get_running_loop()
+    try:
+        variants = await loop.run_in_executor(
+            get_image_executor(), process_image,
+            data, IMAGE_MAX_DIMENSION, IMAGE_THUMBNAIL_DIMENSION, IMAGE_JPEG_QUALITY, IMAGE_MAX_PIXELS
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz görsel dosyası")
+    doc[blob_field] = await store_blob(*variants["image"])
+    doc[thumb_field] = await store_blob(*variants["thumbnail"])
+    doc[base64_field] = None
+    logger.info(
+        f"Görsel işlendi: {len(data)} -> {len(variants['image'][0])} bayt, "
+        f"thumbnail {len(variants['thumbnail'][0])} bayt"
+    )
+
+# ============ REFERENCE DATA CACHE ============
+# Ürün ve bölge listeleri ayda birkaç kez değişir ama en sık istenen veridir.
+# Liste önceden JSON'a serileştirilip bellekte tutulur; versiyon db.cache_versions'ta
+# monoton artan bir sayaçtır ve her yazma işleminde artırılır.
+
+class ReferenceSnapshot:
+    """Versiyonlu, önceden serileştirilmiş referans verisi snapshot'ı"""
+    def __init__(self, name: str, model, loader):
+        self.name = name
+        self.adapter = TypeAdapter(List[model])
+        self.loader = loader
+        self.version = None
+        self.body = None
+        self.etag = None
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+    
+    async def stored_version(self) -> int:
+        doc = await db.cache_versions.find_one({"_id": self.name})
+        return doc["version"] if doc else 0
+    
+    async def refresh(self):
+        if self.body is not None and time.monotonic() - self.checked_at < REFERENCE_CACHE_CHECK_SECONDS:
+            return
+        async with self.lock:
+            if self.body is not None and time.monotonic() - self.checked_at < REFERENCE_CACHE_CHECK_SECONDS:
+                return
+            # Önce versiyon, sonra veri: arada yazma olursa bir sonraki kontrolde yeniden yüklenir
+            version = await self.stored_version()
+            if self.body is None or version != self.version:
+                docs = await self.loader()
+                self.body = self.adapter.dump_json(self.adapter.validate_python(docs))
+                self.version = version
+                # İçerik özeti de eklenir: deploy sonrası serileştirme değişirse eski ETag eşleşmez
+                self.etag = f'"{self.name}-{version}-{hashlib.sha256(self.body).hexdigest()[:16]}"'
+                logger.info(f"Referans snapshot yüklendi: {self.name} v{version} ({len(docs)} kayıt)")
+            self.checked_at = time.monotonic()
+    
+    async def bump(self):
+        """Yazma sonrası versiyonu artır ve yerel snapshot'ı geçersiz kıl"""
+        await db.cache_versions.update_one({"_id": self.name}, {"$inc": {"version": 1}}, upsert=True)
+        self.body = None
+    
+    async def response(self, request: Request) -> Response:
+        await self.refresh()
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self.etag in [t.strip() for t in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+async def load_active_products() -> list:
+    return await db.products.find({"active": True}, {"_id": 0, "photo_base64": 0}).to_list(10000)
+
+async def load_regions() -> list:
+    return await db.regions.find({}, {"_id": 0}).to_list(1000)
+
+products_snapshot = ReferenceSnapshot("products", Product, load_active_products)
+regions_snapshot = ReferenceSnapshot("regions", Region, load_regions)
+
+# ============ DATABASE INITIALIZATION ============
+
+def keyset(*prefix) -> list:
+    """(filtre alanları..., created_at, id) - keyset sayfalama sıralamasıyla uyumlu index anahtarı"""
+    return [*((field, 1) for field in prefix), ("created_at", -1), ("id", -1)]
+
+def changes(*prefix) -> list:
+    """(filtre alanları..., updated_at, id) - /api/sync değişiklik akışı için index anahtarı"""
+    return [*((field, 1) for field in prefix), ("updated_at", 1), ("id", 1)]
+
+# Koleksiyon başına index tanımı; ensure_indexes bunu uygular, check_indexes bununla karşılaştırır
+INDEX_SPEC: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel("username", unique=True),
+        IndexModel("email", unique=True),
+        IndexModel("id", unique=True),
+        IndexModel([("region_id", 1), ("role", 1)]),  # get_team_ids
+        IndexModel(changes("region_id")),
+        IndexModel(changes()),
+    ],
+    "regions": [
+        IndexModel("id", unique=True),
+        IndexModel(changes()),
+    ],
+    "customers": [
+        IndexModel("id", unique=True),
+        IndexModel(keyset("region_id")),
+        IndexModel(keyset()),
+        IndexModel(changes("region_id")),
+        IndexModel(changes()),
+    ],
+    "products": [
+        IndexModel("id", unique=True),
+        IndexModel("code", unique=True),
+        # Sadece aktif ürünler listelenir; pasif ürünler index'e girmez
+        IndexModel(keyset(), name="active_created_at_id", partialFilterExpression={"active": True}),
+        IndexModel(changes()),
+    ],
+    "visits": [
+        IndexModel("id", unique=True),
+        IndexModel(keyset("salesperson_id")),
+        IndexModel(keyset()),
+        IndexModel([("salesperson_id", 1), ("visit_date", 1)]),  # ziyaret raporu
+        IndexModel("visit_date"),
+        IndexModel(changes("salesperson_id")),
+        IndexModel(changes()),
+    ],
+    "sales": [
+        IndexModel("id", unique=True),
+        IndexModel(keyset("salesperson_id")),
+        IndexModel(keyset()),
+        IndexModel([("salesperson_id", 1), ("sale_date", 1)]),  # satış raporu
+        IndexModel("sale_date"),
+        IndexModel(changes("salesperson_id")),
+        IndexModel(changes()),
+    ],
+    "collections": [
+        IndexModel("id", unique=True),
+        IndexModel(keyset("salesperson_id")),
+        IndexModel(keyset()),
+        IndexModel([("salesperson_id", 1), ("collection_date", 1)]),  # zaman serisi
+        IndexModel("collection_date"),
+        IndexModel(changes("salesperson_id")),
+        IndexModel(changes()),
+    ],
+    "documents": [
+        IndexModel("id", unique=True),
+        IndexModel(keyset()),
+    ],
+    "blobs": [
+        IndexModel("hash", unique=True),
+    ],
+    "customer_balances": [
+        IndexModel("customer_id", unique=True),
+        IndexModel([("balance", -1)]),  # en çok borçlu müşteriler
+        IndexModel([("region_id", 1), ("balance", -1)]),
+    ],
+    "idempotency_keys": [
+        IndexModel([("user_id", 1), ("endpoint", 1), ("key", 1)], unique=True),
+        # Süre değişirse mevcut TTL index'i collMod ile güncellenmeli (create_indexes seçenek çakışması verir)
+        IndexModel("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    "tombstones": [
+        IndexModel(changes()),
+        IndexModel("deleted_at", expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 86400),
+    ],
+    "sales_rollups": [
+        # salesperson_id önekiyle komisyon ve dashboard sorgularını da karşılar
+        IndexModel([("salesperson_id", 1), ("region_id", 1), ("month", 1)], unique=True),
+    ],
+}
+
+async def ensure_indexes() -> bool:
+    """INDEX_SPEC'teki indexleri oluştur (mevcut olanlar için no-op); hepsi başarılıysa True"""
+    ok = True
+    for name, models in INDEX_SPEC.items():
+        try:
+            await db[name].create_indexes(models)
+        except Exception as e:
+            logger.error(f"Index oluşturma hatası ({name}): {e}")
+            ok = False
+    logger.info("Veritabanı indexleri oluşturuldu")
+    return ok
+
+async def check_indexes() -> Dict[str, Dict[str, List[str]]]:
+    """$indexStats ile INDEX_SPEC'i karşılaştır: eksik, tanım dışı ve hiç kullanılmamış indexler
+    
+    Kullanım sayaçları mongod yeniden başlatılınca sıfırlanır; "unused" uzun süre çalışmış
+    bir sunucuda anlamlıdır.
+    """
+    report = {}
+    for name, models in INDEX_SPEC.items():
+        try:
+            stats = await db[name].aggregate([{"$indexStats": {}}]).to_list(None)
+        except Exception as e:
+            # Yetki/sunucu kısıtı koleksiyondan bağımsızdır; her koleksiyon için tekrarlamaya gerek yok
+            logger.warning(f"Index istatistikleri alınamadı: {e}")
+            break
+        expected = {model.document["name"] for model in models}
+        existing = {stat["name"]: stat for stat in stats if stat["name"] != "_id_"}
+        result = {
+            "missing": sorted(expected - existing.keys()),
+            "unexpected": sorted(existing.keys() - expected),
+            "unused": sorted(
+                index_name for index_name, stat in existing.items()
+                if stat.get("accesses", {}).get("ops", 0) == 0
+            ),
+        }
+        for kind in ("missing", "unexpected"):
+            if result[kind]:
+                logger.warning(f"Index kontrolü ({name}) {kind}: {', '.join(result[kind])}")
+        if result["unused"]:
+            logger.info(f"Index kontrolü ({name}) unused: {', '.join(result['unused'])}")
+        report[name] = result
+    return report
+
+def index_spec_fingerprint() -> str:
+    """INDEX_SPEC'in kararlı özeti; anahtar sırası korunur, seçenekler sıralanır"""
+    spec = {
+        name: [{**model.document, "key": list(model.document["key"].items())} for model in models]
+        for name, models in INDEX_SPEC.items()
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+async def reconcile_indexes():
+    """Index tanımı son uygulanandan farklıysa indexleri oluştur
+    
+    Değişmemişse tek bir find_one ile çıkar; böylece her soğuk başlangıçta
+    koleksiyon başına create_index turu yapılmaz.
+    """
+    started = time.perf_counter()
+    fingerprint = index_spec_fingerprint()
+    try:
+        state = await db.app_state.find_one({"_id": "index_spec"})
+        if state and state.get("fingerprint") == fingerprint:
+            logger.info("Index tanımı değişmemiş, uzlaştırma atlandı")
+            return
         
-        logger.info("Veritabanı indexleri oluşturuldu")
+        if await ensure_indexes():
+            await db.app_state.update_one(
+                {"_id": "index_spec"},
+                {"$set": {"fingerprint": fingerprint, "applied_at": datetime.now(timezone.utc).isoformat()}},
+                upsert=True
+            )
+        logger.info(f"Index uzlaştırması tamamlandı: {(time.perf_counter() - started) * 1000:.0f}ms")
     except Exception as e:
-        logger.error(f"Index oluşturma hatası: {e}")
+        logger.error(f"Index uzlaştırma hatası: {e}")
+
+async def run_index_check() -> Optional[dict]:
+    """Aralık içinde başka bir worker kontrol etmediyse check_indexes'i çalıştır, raporu app_state'e yaz
+    
+    Sahiplenme atomiktir: kayıt yakın zamanda güncellenmişse filtre eşleşmez, upsert _id çakışması verir.
+    """
+    now = datetime.now(timezone.utc)
+    # Worker'ların uyanma zamanları kayar; tam aralık beklenirse bir tur kaçabilir
+    cutoff = (now - timedelta(seconds=INDEX_CHECK_INTERVAL_SECONDS * 0.9)).isoformat()
+    try:
+        await db.app_state.update_one(
+            {"_id": "index_check", "checked_at": {"$not": {"$gt": cutoff}}},
+            {"$set": {"checked_at": now.isoformat()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return None
+    report = await check_indexes()
+    await db.app_state.update_one({"_id": "index_check"}, {"$set": {"report": report}})
+    return report
+
+async def monitor_indexes():
+    """run_index_check'i INDEX_CHECK_INTERVAL_SECONDS'ta bir çalıştır; ilk tur bir aralık sonra"""
+    while True:
+        await asyncio.sleep(INDEX_CHECK_INTERVAL_SECONDS)
+        try:
+            await run_index_check()
+        except Exception as e:
+            logger.warning(f"Index kontrolü hatası: {e}")
+
+async def run_data_migrations(migrations: dict):
+    """app_state'te uygulanmış olarak işaretlenmemiş taşımaları sırayla çalıştır (tek seferlik)"""
+    for name, job in migrations.items():
+        state_id = f"migration:{name}"
+        try:
+            if await db.app_state.find_one({"_id": state_id}, {"_id": 1}):
+                continue
+            count = await job()
+            await db.app_state.update_one(
+                {"_id": state_id},
+                {"$set": {"applied_at": datetime.now(timezone.utc).isoformat(), "count": count}},
+                upsert=True
+            )
+            logger.info(f"Veri taşıma tamamlandı: {name} ({count} kayıt)")
+        except Exception as e:
+            logger.error(f"Veri taşıma hatası ({name}): {e}")
+
+# Referansı tutulmayan task'lar GC tarafından toplanabilir
+background_tasks: set = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
 
 @app.on_event("startup")
 async def startup_event():
     """Uygulama başlangıcında çalışacak işlemler"""
     logger.info("Uygulama başlatılıyor...")
+    timings = {"import/modül": time.perf_counter() - BOOT_STARTED}
     
     # Veritabanı bağlantısını test et
+    phase_started = time.perf_counter()
     try:
         await client.admin.command('ping')
         logger.info("MongoDB bağlantısı başarılı")
     except Exception as e:
         logger.error(f"MongoDB bağlantı hatası: {e}")
         raise
-    
-    # Indexleri oluştur
-    await ensure_indexes()
-    logger.info("Uygulama başlatıldı")
+    timings["mongo ping"] = time.perf_counter() - phase_started
+    
+    # Türetilmiş koleksiyonların ilk doldurulması istek kabulünden önce: dashboard/prim/alacaklar
+    # boş okumasın ve backfill sırasında gelen $inc'ler yeniden hesaplamayla ezilmesin.
+    # Uygulandıktan sonraki açılışlarda maliyeti tek app_state okuması.
+    phase_started = time.perf_counter()
+    await run_data_migrations(STARTUP_DATA_MIGRATIONS)
+    timings["backfill"] = time.perf_counter() - phase_started
+    
+    # Index uzlaştırması ve diğer veri taşımaları arka planda; istek kabulünü bekletmez
+    spawn_background(reconcile_indexes())
+    spawn_background(run_data_migrations(DATA_MIGRATIONS))
+    if INDEX_CHECK_INTERVAL_SECONDS > 0:
+        spawn_background(monitor_indexes())
+    if LIVE_EVENTS_BACKEND == "mongo":
+        phase_started = time.perf_counter()
+        await ensure_live_events_collection()
+        timings["live_events"] = time.perf_counter() - phase_started
+        spawn_background(relay_live_events())
+    
+    timings["toplam"] = time.perf_counter() - BOOT_STARTED
+    logger.info("Uygulama başlatıldı - " + ", ".join(f"{label}: {elapsed * 1000:.0f}ms" for label, elapsed in timings.items()))
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Uygulama kapanışında çalışacak işlemler"""
     logger.info("Uygulama kapatılıyor...")
+    for task in background_tasks:
+        task.cancel()
+    password_executor.shutdown(wait=False)
+    if image_executor is not None:
+        image_executor.shutdown(wait=False)
     client.close()
     logger.info("MongoDB bağlantısı kapatıldı")
 
@@ -562,20 +1555,23 @@ async def login(request: LoginRequest, req: Request):
     client_ip = req.client.host if req.client else "unknown"
     rate_limit_key = f"{client_ip}:{request.username}"
     
-    # Rate limit kontrolü
-    if login_rate_limiter.is_rate_limited(rate_limit_key):
+    # Rate limit kontrolü - GCRA kilitte her window/max_attempts'ta bir yeni hak açar
+    retry_after = await login_rate_limiter.retry_after(rate_limit_key)
+    if retry_after:
         logger.warning(f"Rate limit aşıldı: {rate_limit_key}")
+        wait = f"{retry_after} saniye" if retry_after < 120 else f"{math.ceil(retry_after / 60)} dakika"
         raise HTTPException(
-            status_code=429, 
-            detail="Çok fazla başarısız giriş denemesi. Lütfen 5 dakika bekleyin."
+            status_code=429,
+            detail=f"Çok fazla başarısız giriş denemesi. Lütfen {wait} bekleyin.",
+            headers={"Retry-After": str(retry_after)}
         )
     
     # Kullanıcıyı bul
     user = await db.users.find_one({"username": request.username}, {"_id": 0})
     
     # Güvenlik: Kullanıcı yoksa veya şifre yanlışsa aynı mesajı ver
-    if not user or not verify_password(request.password, user.get("password_hash", "")):
-        login_rate_limiter.record_attempt(rate_limit_key)
+    if not user or not await verify_password_async(request.password, user.get("password_hash", "")):
+        await login_rate_limiter.record_attempt(rate_limit_key)
         logger.warning(f"Başarısız giriş denemesi: {request.username}")
         raise HTTPException(status_code=401, detail="Kullanıcı adı veya şifre hatalı")
     
@@ -583,7 +1579,7 @@ async def login(request: LoginRequest, req: Request):
         raise HTTPException(status_code=401, detail="Hesap devre dışı bırakılmış")
     
     # Başarılı giriş - rate limiter'ı sıfırla
-    login_rate_limiter.reset(rate_limit_key)
+    await login_rate_limiter.reset(rate_limit_key)
     
     access_token = create_access_token({"sub": user["id"], "role": user["role"]})
     
@@ -605,33 +1601,150 @@ async def get_dashboard(current_user: dict = Depends(get_current_user)):
     """Dashboard istatistikleri"""
     return await get_dashboard_stats(current_user)
 
+# ============ SALES ROLLUPS ============
+# sales_rollups: (salesperson_id, region_id, month) başına aylık satış/tahsilat özetleri.
+# Yazma işlemlerinde $inc ile güncellenir, dashboard ve prim bu küçük koleksiyondan okunur.
+
+def rollup_month(iso_timestamp: str) -> str:
+    """ISO tarih damgasından YYYY-MM ay anahtarı"""
+    return iso_timestamp[:7]
+
+async def increment_sales_rollup(salesperson_id: str, region_id: Optional[str], month: str, **increments):
+    """Rollup dokümanını atomik $inc ile güncelle (yoksa oluştur)"""
+    await db.sales_rollups.update_one(
+        {"salesperson_id": salesperson_id, "region_id": region_id, "month": month},
+        {"$inc": increments},
+        upsert=True
+    )
+
+async def bulk_increment_sales_rollups(increments: Dict[tuple, Dict[str, float]]):
+    """(salesperson_id, region_id, month) -> {alan: artış} eşlemesini tek bulk_write ile uygula"""
+    if not increments:
+        return
+    await db.sales_rollups.bulk_write([
+        UpdateOne(
+            {"salesperson_id": salesperson_id, "region_id": region_id, "month": month},
+            {"$inc": fields},
+            upsert=True
+        )
+        for (salesperson_id, region_id, month), fields in increments.items()
+    ], ordered=False)
+
+async def aggregate_rollup_summary(match: dict, month: str) -> dict:
+    """Rollup dokümanlarından toplam ve bu ayki değerleri hesapla"""
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": None,
+            "sales_count": {"$sum": "$sales_count"},
+            "sales_amount": {"$sum": "$sales_amount"},
+            "collections_amount": {"$sum": "$collections_amount"},
+            "monthly_count": {"$sum": {"$cond": [{"$eq": ["$month", month]}, "$sales_count", 0]}},
+            "monthly_amount": {"$sum": {"$cond": [{"$eq": ["$month", month]}, "$sales_amount", 0]}}
+        }}
+    ]
+    result = await db.sales_rollups.aggregate(pipeline).to_list(1)
+    summary = result[0] if result else {}
+    return {
+        "count": summary.get("sales_count", 0),
+        "amount": summary.get("sales_amount", 0),
+        "collections_amount": summary.get("collections_amount", 0),
+        "monthly_count": summary.get("monthly_count", 0),
+        "monthly_amount": summary.get("monthly_amount", 0)
+    }
+
+async def rebuild_sales_rollups() -> int:
+    """Rollup koleksiyonunu sales/collections'tan yeniden hesapla (backfill ve tutarsızlık onarımı)"""
+    month_expr = {"$substrCP": ["$created_at", 0, 7]}
+    sales_groups = await db.sales.aggregate([
+        {"$group": {
+            "_id": {"salesperson_id": "$salesperson_id", "month": month_expr},
+            "count": {"$sum": 1},
+            "amount": {"$sum": "$total_amount"}
+        }}
+    ]).to_list(None)
+    collection_groups = await db.collections.aggregate([
+        {"$group": {
+            "_id": {"salesperson_id": "$salesperson_id", "month": month_expr},
+            "count": {"$sum": 1},
+            "amount": {"$sum": "$amount"}
+        }}
+    ]).to_list(None)
+    
+    users = await db.users.find({}, {"_id": 0, "id": 1, "region_id": 1}).to_list(None)
+    user_regions = {u["id"]: u.get("region_id") for u in users}
+    
+    rollups: Dict[tuple, dict] = {}
+    for group, prefix in ((sales_groups, "sales"), (collection_groups, "collections")):
+        for g in group:
+            salesperson_id = g["_id"]["salesperson_id"]
+            key = (salesperson_id, g["_id"]["month"])
+            doc = rollups.setdefault(key, {
+                "salesperson_id": salesperson_id,
+                "region_id": user_regions.get(salesperson_id),
+                "month": g["_id"]["month"],
+                "sales_count": 0,
+                "sales_amount": 0,
+                "collections_count": 0,
+                "collections_amount": 0
+            })
+            doc[f"{prefix}_count"] = g["count"]
+            doc[f"{prefix}_amount"] = g["amount"]
+    
+    operations = [DeleteMany({})] + [
+        ReplaceOne(
+            {"salesperson_id": doc["salesperson_id"], "region_id": doc["region_id"], "month": doc["month"]},
+            doc,
+            upsert=True
+        )
+        for doc in rollups.values()
+    ]
+    await db.sales_rollups.bulk_write(operations, ordered=True)
+    logger.info(f"Satış rollup'ları yeniden oluşturuldu: {len(rollups)} kayıt")
+    return len(rollups)
+
+def commission_emoji(monthly_amount: float) -> str:
+    """Aylık satış tutarına göre prim emojisi"""
+    if monthly_amount > 50000:
+        return "🏆"
+    if monthly_amount > 30000:
+        return "🔥"
+    if monthly_amount > 10000:
+        return "💪"
+    return "🌱"
+
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
+    cache_key = response_cache_key("dashboard_stats", current_user)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    stats = await compute_dashboard_stats(current_user)
+    response_cache.set(cache_key, stats)
+    return stats
+
+async def compute_dashboard_stats(current_user: dict) -> dict:
     role = current_user["role"]
     user_id = current_user["id"]
     
-    now = datetime.now(timezone.utc)
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
+    month = rollup_month(datetime.now(timezone.utc).isoformat())
     
     if role == "admin":
-        total_sales_docs = await db.sales.find({}).to_list(10000)
-        total_visits = await db.visits.count_documents({})
-        total_collections_docs = await db.collections.find({}).to_list(10000)
-        total_customers = await db.customers.count_documents({})
-        
-        total_sales_amount = sum([s["total_amount"] for s in total_sales_docs])
-        total_collections_amount = sum([c["amount"] for c in total_collections_docs])
-        
-        monthly_sales = [s for s in total_sales_docs if s["created_at"] >= start_of_month]
-        monthly_amount = sum([s["total_amount"] for s in monthly_sales])
+        results = await gather_queries(
+            "dashboard_stats:admin",
+            sales=aggregate_rollup_summary({}, month),
+            visits=db.visits.count_documents({}),
+            customers=db.customers.count_documents({})
+        )
+        sales_summary = results["sales"]
         
         return {
-            "total_sales": len(total_sales_docs),
-            "total_sales_amount": total_sales_amount,
-            "total_visits": total_visits,
-            "total_collections": total_collections_amount,
-            "total_customers": total_customers,
-            "monthly_sales_amount": monthly_amount
+            "total_sales": sales_summary["count"],
+            "total_sales_amount": sales_summary["amount"],
+            "total_visits": results["visits"],
+            "total_collections": sales_summary["collections_amount"],
+            "total_customers": results["customers"],
+            "monthly_sales_amount": sales_summary["monthly_amount"]
         }
     
     elif role == "regional_manager":
@@ -639,56 +1752,266 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         if not region_id:
             return {"error": "Bölge ataması yok"}
         
-        team_users = await db.users.find({"region_id": region_id, "role": "salesperson"}, {"_id": 0}).to_list(100)
-        team_ids = [u["id"] for u in team_users]
-        
-        team_sales = await db.sales.find({"salesperson_id": {"$in": team_ids}}).to_list(10000)
-        team_visits = await db.visits.count_documents({"salesperson_id": {"$in": team_ids}})
-        team_collections_docs = await db.collections.find({"salesperson_id": {"$in": team_ids}}).to_list(10000)
-        
-        total_sales_amount = sum([s["total_amount"] for s in team_sales])
-        total_collections_amount = sum([c["amount"] for c in team_collections_docs])
+        team_ids = await get_team_ids(region_id)
+        team_match = {"salesperson_id": {"$in": team_ids}}
         
-        monthly_sales = [s for s in team_sales if s["created_at"] >= start_of_month]
-        monthly_amount = sum([s["total_amount"] for s in monthly_sales])
+        results = await gather_queries(
+            "dashboard_stats:regional_manager",
+            sales=aggregate_rollup_summary(team_match, month),
+            visits=db.visits.count_documents(team_match)
+        )
+        sales_summary = results["sales"]
         
         return {
-            "total_sales": len(team_sales),
-            "total_sales_amount": total_sales_amount,
-            "total_visits": team_visits,
-            "total_collections": total_collections_amount,
-            "team_size": len(team_users),
-            "monthly_sales_amount": monthly_amount
+            "total_sales": sales_summary["count"],
+            "total_sales_amount": sales_summary["amount"],
+            "total_visits": results["visits"],
+            "total_collections": sales_summary["collections_amount"],
+            "team_size": len(team_ids),
+            "monthly_sales_amount": sales_summary["monthly_amount"]
         }
     
     else:  # salesperson
-        my_sales = await db.sales.find({"salesperson_id": user_id}).to_list(10000)
-        my_visits = await db.visits.count_documents({"salesperson_id": user_id})
-        my_collections_docs = await db.collections.find({"salesperson_id": user_id}).to_list(10000)
-        
-        total_sales_amount = sum([s["total_amount"] for s in my_sales])
-        total_collections_amount = sum([c["amount"] for c in my_collections_docs])
-        
-        monthly_sales = [s for s in my_sales if s["created_at"] >= start_of_month]
-        monthly_amount = sum([s["total_amount"] for s in monthly_sales])
+        my_match = {"salesperson_id": user_id}
         
-        emoji = "🌱"
-        if monthly_amount > 50000:
-            emoji = "🏆"
-        elif monthly_amount > 30000:
-            emoji = "🔥"
-        elif monthly_amount > 10000:
-            emoji = "💪"
+        results = await gather_queries(
+            "dashboard_stats:salesperson",
+            sales=aggregate_rollup_summary(my_match, month),
+            visits=db.visits.count_documents(my_match)
+        )
+        sales_summary = results["sales"]
         
         return {
-            "total_sales": len(my_sales),
-            "total_sales_amount": total_sales_amount,
-            "total_visits": my_visits,
-            "total_collections": total_collections_amount,
-            "monthly_sales_amount": monthly_amount,
-            "commission_emoji": emoji
+            "total_sales": sales_summary["count"],
+            "total_sales_amount": sales_summary["amount"],
+            "total_visits": results["visits"],
+            "total_collections": sales_summary["collections_amount"],
+            "monthly_sales_amount": sales_summary["monthly_amount"],
+            "commission_emoji": commission_emoji(sales_summary["monthly_amount"])
         }
 
+# ============ LIVE DASHBOARD ============
+# Yazma handler'ları dashboard artışlarını rollup alan adlarıyla yayınlar. Her SSE abonesi kendi
+# kapsamına düşen olayları sunucudaki istatistik kopyasına uygular ve istemciye sadece artışları
+# gönderir: açık dashboard'lar periyodik yeniden hesaplama yerine yazma başına iş üretir.
+
+# Yayınlanan artış alanı -> dashboard istatistik alanı
+LIVE_STAT_FIELDS = {
+    "sales_count": "total_sales",
+    "sales_amount": "total_sales_amount",
+    "collections_amount": "total_collections",
+    "visits": "total_visits",
+    "customers": "total_customers"
+}
+
+class LiveSubscriber:
+    """Tek SSE bağlantısı: kapsam, istemcideki istatistiklerin sunucu kopyası ve sınırlı olay kuyruğu"""
+    def __init__(self, user: dict):
+        self.user = user
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.stats: dict = {}
+        self.month = ""
+        self.stale = True  # Snapshot bekleniyor; bu sırada gelen olaylar atlanır
+    
+    def wants(self, event: dict) -> bool:
+        role = self.user["role"]
+        if role == "admin":
+            return True
+        if role == "regional_manager":
+            return bool(event["region_id"]) and event["region_id"] == self.user.get("region_id")
+        return event["salesperson_id"] == self.user["id"]
+    
+    def reset(self, stats: dict):
+        """Tam snapshot gönderildi: kopyayı yenile, öncesine ait bekleyen artışları at"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.stats = dict(stats)
+        self.month = rollup_month(datetime.now(timezone.utc).isoformat())
+        self.stale = False
+    
+    def offer(self, event: dict):
+        """Kapsamdaki olayı kopyaya uygula ve artışları kuyruğa koy"""
+        if self.stale or not self.wants(event):
+            return
+        if event["month"] > self.month:
+            # Ay döndü: aylık toplam sıfırdan başlamalı
+            self.request_resync()
+            return
+        increments = {}
+        for field, value in event["increments"].items():
+            stat = LIVE_STAT_FIELDS.get(field)
+            if stat in self.stats:
+                increments[stat] = value
+        if "total_sales_amount" in increments and event["month"] == self.month and "monthly_sales_amount" in self.stats:
+            increments["monthly_sales_amount"] = increments["total_sales_amount"]
+        if not increments:
+            return
+        for stat, value in increments.items():
+            self.stats[stat] += value
+        message = {"increments": increments}
+        if "commission_emoji" in self.stats and "monthly_sales_amount" in increments:
+            self.stats["commission_emoji"] = commission_emoji(self.stats["monthly_sales_amount"])
+            message["commission_emoji"] = self.stats["commission_emoji"]
+        try:
+            self.queue.put_nowait(("delta", message))
+        except asyncio.QueueFull:
+            self.request_resync()
+    
+    def request_resync(self):
+        """Geride kalan istemci: bekleyen artışlar atılır, yerine tek bir tam snapshot gönderilir"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.stale = True
+        self.queue.put_nowait(("resync", None))
+
+class LiveDashboardHub:
+    """Worker'daki SSE aboneleri; yayınlanan olayları kapsamlarına göre dağıtır"""
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.subscribers: set = set()
+        self.published = 0
+        self.resyncs = 0
+    
+    def subscribe(self, user: dict) -> Optional[LiveSubscriber]:
+        """Yer ayır ve aboneyi kaydet; limit doluysa None. Kontrol ve ekleme arasında await yok."""
+        if len(self.subscribers) >= self.max_connections:
+            return None
+        subscriber = LiveSubscriber(user)
+        self.subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: LiveSubscriber):
+        self.subscribers.discard(subscriber)
+    
+    def dispatch(self, event: dict):
+        self.published += 1
+        for subscriber in list(self.subscribers):
+            was_stale = subscriber.stale
+            subscriber.offer(event)
+            if subscriber.stale and not was_stale:
+                self.resyncs += 1
+    
+    def stats(self) -> dict:
+        return {
+            "backend": LIVE_EVENTS_BACKEND,
+            "connections": len(self.subscribers),
+            "max_connections": self.max_connections,
+            "published": self.published,
+            "resyncs": self.resyncs
+        }
+
+live_hub = LiveDashboardHub(LIVE_MAX_CONNECTIONS)
+
+async def publish_dashboard_delta(salesperson_id: Optional[str], region_id: Optional[str], month: str, **increments):
+    """Dashboard artışını yayınla - alanlar: sales_count, sales_amount, collections_amount, visits, customers
+    
+    month: rollup ayı (created_at); salesperson_id olmayan olaylar (müşteri) sadece admin/bölge kapsamına düşer.
+    """
+    event = {"salesperson_id": salesperson_id, "region_id": region_id, "month": month, "increments": increments}
+    if LIVE_EVENTS_BACKEND != "mongo":
+        live_hub.dispatch(event)
+        return
+    try:
+        await db.live_events.insert_one(event)
+    except Exception as e:
+        # Canlı akış best-effort; abonelerin periyodik snapshot'ı sapmayı düzeltir
+        logger.warning(f"Canlı dashboard olayı yazılamadı: {e}")
+
+async def ensure_live_events_collection():
+    """LIVE_EVENTS_BACKEND=mongo: capped live_events koleksiyonunu istek kabulünden önce oluştur
+    
+    İlk insert'ten sonra oluşturulmaya çalışılırsa Mongo normal koleksiyon açmış olur ve tailable
+    cursor hiç çalışmaz; bu durumda açılış durdurulur.
+    """
+    try:
+        await db.create_collection("live_events", capped=True, size=LIVE_EVENTS_CAPPED_BYTES)
+    except CollectionInvalid:
+        options = await db.live_events.options()
+        if not options.get("capped"):
+            raise RuntimeError(
+                "live_events koleksiyonu capped değil; silinip yeniden oluşturulmalı (LIVE_EVENTS_BACKEND=mongo)"
+            )
+
+async def relay_live_events():
+    """LIVE_EVENTS_BACKEND=mongo: capped live_events koleksiyonunu izleyip yerel abonelere dağıt"""
+    # Başlangıçtan önceki olaylar zaten abonelerin ilk snapshot'ına dahil
+    last = await db.live_events.find_one({}, sort=[("$natural", -1)])
+    last_id = last["_id"] if last else None
+    while True:
+        try:
+            cursor = db.live_events.find(
+                {"_id": {"$gt": last_id}} if last_id is not None else {}, cursor_type=CursorType.TAILABLE_AWAIT
+            )
+            while cursor.alive:
+                async for doc in cursor:
+                    last_id = doc.pop("_id")
+                    live_hub.dispatch(doc)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Canlı olay akışı hatası: {e}")
+        # Boş capped koleksiyonda tailable cursor hemen kapanır
+        await asyncio.sleep(1)
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@api_router.get("/live/dashboard")
+async def live_dashboard(credentials: HTTPAuthorizationCredentials = Depends(security),
+                         current_user: dict = Depends(get_current_user)):
+    """Dashboard istatistiklerini Server-Sent Events ile akıt (/dashboard/stats polling'inin yerine)
+    
+    event: snapshot -> /dashboard/stats ile aynı gövde; bağlantıda, resync'te ve LIVE_SNAPSHOT_SECONDS'ta bir
+    event: delta    -> {"increments": {alan: artış}, "commission_emoji"?}; istemci artışları alanlara ekler
+    event: closed   -> {"detail": ...}; token süresi doldu veya hesap devre dışı, akış kapanır
+    """
+    token_expires_at = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[ALGORITHM])["exp"]
+    # Yer handler'da ayrılır: aynı anda gelen bağlantılar limiti aşamaz
+    subscriber = live_hub.subscribe(current_user)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Canlı bağlantı limiti dolu, lütfen daha sonra tekrar deneyin")
+    
+    async def generate():
+        snapshot_at = 0.0
+        checked_at = time.monotonic()
+        try:
+            while True:
+                # Uzun ömürlü bağlantı: token süresi ve hesap durumu istek başına değil periyodik kontrol edilir
+                if time.time() >= token_expires_at or time.monotonic() - checked_at >= LIVE_HEARTBEAT_SECONDS:
+                    try:
+                        user = await get_current_user(credentials)
+                    except HTTPException as e:
+                        yield sse_event("closed", {"detail": e.detail})
+                        return
+                    checked_at = time.monotonic()
+                    if (user["role"], user.get("region_id")) != (subscriber.user["role"], subscriber.user.get("region_id")):
+                        subscriber.user = user
+                        subscriber.stale = True
+                if subscriber.stale or time.monotonic() - snapshot_at >= LIVE_SNAPSHOT_SECONDS:
+                    stats = await get_dashboard_stats(subscriber.user)
+                    subscriber.reset(stats)
+                    snapshot_at = time.monotonic()
+                    yield sse_event("snapshot", stats)
+                    continue
+                timeout = min(LIVE_HEARTBEAT_SECONDS, max(token_expires_at - time.time(), 0) + 0.1)
+                try:
+                    kind, message = await asyncio.wait_for(subscriber.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if kind == "delta":
+                    yield sse_event("delta", message)
+        finally:
+            live_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Akış hiç başlamazsa generator'ın finally'si çalışmaz; yer yanıt bitince yine de bırakılır
+        background=BackgroundTask(live_hub.unsubscribe, subscriber)
+    )
+
 # ============ USERS ============
 
 @api_router.get("/users", response_model=List[UserResponse])
@@ -721,7 +2044,7 @@ async def create_user(user_create: UserCreate, current_user: dict = Depends(get_
     
     user_dict = user_create.model_dump()
     password = user_dict.pop("password")
-    user_obj = User(**user_dict, password_hash=get_password_hash(password))
+    user_obj = User(**user_dict, password_hash=await get_password_hash_async(password))
     
     try:
         await db.users.insert_one(user_obj.model_dump())
@@ -730,6 +2053,7 @@ async def create_user(user_create: UserCreate, current_user: dict = Depends(get_
         if "duplicate key" in str(e).lower():
             raise HTTPException(status_code=400, detail="Kullanıcı adı veya email zaten mevcut")
         raise HTTPException(status_code=500, detail="Kullanıcı oluşturulurken bir hata oluştu")
+    await invalidate_team_cache()
     
     return UserResponse(**user_obj.model_dump())
 
@@ -743,19 +2067,27 @@ async def update_user(user_id: str, user_update: UserUpdate, current_user: dict
     
     # Şifre güncellemesi varsa hashle
     if "password" in update_data and update_data["password"]:
-        update_data["password_hash"] = get_password_hash(update_data.pop("password"))
+        update_data["password_hash"] = await get_password_hash_async(update_data.pop("password"))
     elif "password" in update_data:
         del update_data["password"]
     
     if not update_data:
         raise HTTPException(status_code=400, detail="Güncellenecek alan bulunamadı")
     
-    await db.users.update_one({"id": user_id}, {"$set": update_data})
+    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    previous = await db.users.find_one_and_update(
+        {"id": user_id}, {"$set": update_data}, {"_id": 0, "region_id": 1}
+    )
     updated = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
     
     if not updated:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
     
+    user_cache.discard(user_id)
+    await invalidate_team_cache()
+    # Rol/bölge değişikliği ekip toplamlarını etkiler
+    invalidate_response_cache(user_id, ((previous or {}).get("region_id"), updated.get("region_id")), months=None)
+    
     logger.info(f"Kullanıcı güncellendi: {user_id}")
     return UserResponse(**updated)
 
@@ -768,9 +2100,12 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
     if current_user["id"] == user_id:
         raise HTTPException(status_code=400, detail="Kendi hesabınızı silemezsiniz")
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    deleted = await db.users.find_one_and_delete({"id": user_id}, {"_id": 0, "region_id": 1})
+    user_cache.discard(user_id)
+    await invalidate_team_cache()
+    if not deleted:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+    await record_tombstone("users", user_id, region_id=deleted.get("region_id"))
     
     logger.info(f"Kullanıcı silindi: {user_id}")
     return {"message": "Kullanıcı başarıyla silindi"}
@@ -778,9 +2113,8 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
 # ============ REGIONS ============
 
 @api_router.get("/regions", response_model=List[Region])
-async def get_regions(current_user: dict = Depends(get_current_user)):
-    regions = await db.regions.find({}, {"_id": 0}).to_list(1000)
-    return regions
+async def get_regions(request: Request, current_user: dict = Depends(get_current_user)):
+    return await regions_snapshot.response(request)
 
 @api_router.post("/regions", response_model=Region)
 async def create_region(region: RegionCreate, current_user: dict = Depends(get_current_user)):
@@ -788,6 +2122,7 @@ async def create_region(region: RegionCreate, current_user: dict = Depends(get_c
         raise HTTPException(status_code=403, detail="Sadece admin bölge ekleyebilir")
     region_obj = Region(**region.model_dump())
     await db.regions.insert_one(region_obj.model_dump())
+    await regions_snapshot.bump()
     logger.info(f"Yeni bölge oluşturuldu: {region.name}")
     return region_obj
 
@@ -795,7 +2130,10 @@ async def create_region(region: RegionCreate, current_user: dict = Depends(get_c
 async def update_region(region_id: str, region_update: dict, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
-    await db.regions.update_one({"id": region_id}, {"$set": region_update})
+    await db.regions.update_one(
+        {"id": region_id}, {"$set": {**region_update, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    await regions_snapshot.bump()
     updated = await db.regions.find_one({"id": region_id}, {"_id": 0})
     if not updated:
         raise HTTPException(status_code=404, detail="Bölge bulunamadı")
@@ -806,48 +2144,68 @@ async def delete_region(region_id: str, current_user: dict = Depends(get_current
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
     result = await db.regions.delete_one({"id": region_id})
+    await regions_snapshot.bump()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Bölge bulunamadı")
+    await record_tombstone("regions", region_id)
     return {"message": "Bölge başarıyla silindi"}
 
 # ============ CUSTOMERS ============
 
-@api_router.get("/customers", response_model=List[Customer])
-async def get_customers(current_user: dict = Depends(get_current_user)):
+@api_router.get("/customers", response_model=Union[List[Customer], Page[Customer]])
+async def get_customers(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     query = {}
     if current_user["role"] == "regional_manager":
         query = {"region_id": current_user.get("region_id")}
-    customers = await db.customers.find(query, {"_id": 0}).to_list(10000)
-    return customers
+    return await find_list_or_page(db.customers, query, Customer, limit, cursor, 10000, fields=fields)
 
 @api_router.post("/customers", response_model=Customer)
 async def create_customer(customer: CustomerCreate, current_user: dict = Depends(get_current_user)):
     customer_obj = Customer(**customer.model_dump())
     await db.customers.insert_one(customer_obj.model_dump())
+    await publish_dashboard_delta(None, customer_obj.region_id, rollup_month(customer_obj.created_at), customers=1)
     logger.info(f"Yeni müşteri oluşturuldu: {customer.name}")
     return customer_obj
 
 @api_router.put("/customers/{customer_id}", response_model=Customer)
 async def update_customer(customer_id: str, customer_update: dict, current_user: dict = Depends(get_current_user)):
-    await db.customers.update_one({"id": customer_id}, {"$set": customer_update})
+    await db.customers.update_one(
+        {"id": customer_id}, {"$set": {**customer_update, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
     updated = await db.customers.find_one({"id": customer_id}, {"_id": 0})
     if not updated:
         raise HTTPException(status_code=404, detail="Müşteri bulunamadı")
+    # Bakiye listesindeki ad/bölge kopyası
+    await db.customer_balances.update_one(
+        {"customer_id": customer_id},
+        {"$set": {"customer_name": updated.get("name"), "region_id": updated.get("region_id")}}
+    )
+    invalidate_receivables_cache()
     return Customer(**updated)
 
 @api_router.delete("/customers/{customer_id}")
 async def delete_customer(customer_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.customers.delete_one({"id": customer_id})
-    if result.deleted_count == 0:
+    deleted = await db.customers.find_one_and_delete({"id": customer_id}, {"_id": 0, "region_id": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Müşteri bulunamadı")
+    await record_tombstone("customers", customer_id, region_id=deleted.get("region_id"))
+    # Silinen müşterinin bakiyesi alacak raporlarında yetim satır olarak kalmasın
+    await db.customer_balances.delete_one({"customer_id": customer_id})
+    invalidate_receivables_cache()
+    await publish_dashboard_delta(
+        None, deleted.get("region_id"), rollup_month(datetime.now(timezone.utc).isoformat()), customers=-1
+    )
     return {"message": "Müşteri başarıyla silindi"}
 
 # ============ PRODUCTS ============
 
-@api_router.get("/products", response_model=List[Product])
-async def get_products(current_user: dict = Depends(get_current_user)):
-    products = await db.products.find({"active": True}, {"_id": 0}).to_list(10000)
-    return products
+@api_router.get("/products", response_model=Union[List[Product], Page[Product]])
+async def get_products(request: Request, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    if limit is None and cursor is None and fields is None:
+        return await products_snapshot.response(request)
+    return await find_list_or_page(
+        db.products, {"active": True}, Product, limit, cursor, 10000, exclude=("photo_base64",), fields=fields
+    )
 
 @api_router.post("/products", response_model=Product)
 async def create_product(product: ProductCreate, current_user: dict = Depends(get_current_user)):
@@ -859,8 +2217,11 @@ async def create_product(product: ProductCreate, current_user: dict = Depends(ge
     if existing:
         raise HTTPException(status_code=400, detail="Bu ürün kodu zaten kullanılıyor")
     
-    product_obj = Product(**product.model_dump())
+    product_data = product.model_dump()
+    await ingest_image(product_data, "photo_base64", "photo_blob", "photo_thumb_blob")
+    product_obj = Product(**product_data)
     await db.products.insert_one(product_obj.model_dump())
+    await products_snapshot.bump()
     logger.info(f"Yeni ürün oluşturuldu: {product.name}")
     return product_obj
 
@@ -868,7 +2229,16 @@ async def create_product(product: ProductCreate, current_user: dict = Depends(ge
 async def update_product(product_id: str, product_update: dict, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
-    await db.products.update_one({"id": product_id}, {"$set": product_update})
+    if "photo_base64" in product_update:
+        if product_update["photo_base64"]:
+            await ingest_image(product_update, "photo_base64", "photo_blob", "photo_thumb_blob")
+        else:
+            # Boş değer mevcut fotoğrafı silmez
+            del product_update["photo_base64"]
+    await db.products.update_one(
+        {"id": product_id}, {"$set": {**product_update, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    await products_snapshot.bump()
     updated = await db.products.find_one({"id": product_id}, {"_id": 0})
     if not updated:
         raise HTTPException(status_code=404, detail="Ürün bulunamadı")
@@ -879,32 +2249,39 @@ async def delete_product(product_id: str, current_user: dict = Depends(get_curre
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
     # Soft delete
-    result = await db.products.update_one({"id": product_id}, {"$set": {"active": False}})
+    result = await db.products.update_one(
+        {"id": product_id, "active": {"$ne": False}},
+        {"$set": {"active": False, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    await products_snapshot.bump()
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Ürün bulunamadı")
     return {"message": "Ürün devre dışı bırakıldı"}
 
 # ============ VISITS ============
 
-@api_router.get("/visits", response_model=List[Visit])
-async def get_visits(current_user: dict = Depends(get_current_user)):
+@api_router.get("/visits", response_model=Union[List[Visit], Page[Visit]])
+async def get_visits(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     query = {}
     if current_user["role"] == "salesperson":
         query = {"salesperson_id": current_user["id"]}
     elif current_user["role"] == "regional_manager":
-        team_users = await db.users.find({"region_id": current_user.get("region_id"), "role": "salesperson"}, {"_id": 0}).to_list(100)
-        team_ids = [u["id"] for u in team_users]
+        team_ids = await get_team_ids(current_user.get("region_id"))
         query = {"salesperson_id": {"$in": team_ids}}
     
-    visits = await db.visits.find(query, {"_id": 0}).to_list(10000)
-    return visits
+    return await find_list_or_page(db.visits, query, Visit, limit, cursor, 10000, exclude=("photo_base64",), fields=fields)
 
 @api_router.post("/visits", response_model=Visit)
 async def create_visit(visit: VisitCreate, current_user: dict = Depends(get_current_user)):
     visit_data = visit.model_dump()
     visit_data["salesperson_id"] = current_user["id"]
+    await ingest_image(visit_data, "photo_base64", "photo_blob", "photo_thumb_blob")
     visit_obj = Visit(**visit_data)
     await db.visits.insert_one(visit_obj.model_dump())
+    invalidate_response_cache(visit_obj.salesperson_id, (current_user.get("region_id"),))
+    await publish_dashboard_delta(
+        visit_obj.salesperson_id, current_user.get("region_id"), rollup_month(visit_obj.created_at), visits=1
+    )
     return visit_obj
 
 @api_router.get("/visits/{visit_id}", response_model=Visit)
@@ -914,25 +2291,139 @@ async def get_visit(visit_id: str, current_user: dict = Depends(get_current_user
         raise HTTPException(status_code=404, detail="Ziyaret bulunamadı")
     return Visit(**visit)
 
+# ============ IDEMPOTENCY ============
+# Mobil istemci yeniden denemelerinde aynı Idempotency-Key ile gelen istek tekrar yazılmaz;
+# ilk isteğin yanıtı idempotency_keys koleksiyonundan döner.
+
+async def run_idempotent(idempotency_key: Optional[str], endpoint: str, current_user: dict, payload: BaseModel,
+                         model, handler):
+    """handler(resource_id) sonucunu (Pydantic model) anahtar başına bir kez üret, tekrarlarda saklanan yanıtı döndür
+    
+    endpoint: kaydın yazıldığı koleksiyon adı. Kayıt id'si rezervasyonda belirlenir; kilidi süresi dolmuş
+    (worker ölmüş/iptal edilmiş) bir denemeyi devralan istek önce bu id'nin yazılıp yazılmadığına bakar.
+    Başarısız deneme anahtarı sadece kayıt yazılmadıysa siler; yazılmışsa (veya iptalde belirsizse) kilidi
+    düşürür, böylece yeniden deneme ikinci kayıt yazmak yerine aynı resource_id'yi devralır.
+    """
+    if not idempotency_key:
+        return await handler(None)
+    
+    selector = {"user_id": current_user["id"], "endpoint": endpoint, "key": idempotency_key}
+    request_hash = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    
+    def replay(record: dict):
+        if record["request_hash"] != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key farklı bir istek için kullanılmış")
+        if record.get("response") is None:
+            raise HTTPException(status_code=409, detail="Aynı Idempotency-Key ile istek hâlâ işleniyor")
+        return record["response"]
+    
+    async def reserve(exists: bool) -> Tuple[Optional[dict], bool]:
+        """Anahtarı bu istek adına kilitle -> (kayıt, devralındı mı); başka bir istek işliyor veya bitirmişse kayıt None"""
+        now = datetime.now(timezone.utc)
+        lease = {"lease_id": str(uuid.uuid4()), "locked_until": now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)}
+        if not exists:
+            record = {
+                **selector,
+                "request_hash": request_hash,
+                "response": None,
+                "resource_id": str(uuid.uuid4()),
+                "created_at": now,
+                **lease
+            }
+            try:
+                await db.idempotency_keys.insert_one(record)
+                return record, False
+            except DuplicateKeyError:
+                pass
+        # Kilidi süresi dolmuş bekleyen kayıt devralınır (locked_until'sız eski kayıtlar dahil)
+        result = await db.idempotency_keys.update_one(
+            {**selector, "request_hash": request_hash, "response": None, "locked_until": {"$not": {"$gte": now}}},
+            {"$set": lease}
+        )
+        if not result.modified_count:
+            return None, True
+        return await db.idempotency_keys.find_one({**selector, "lease_id": lease["lease_id"]}, {"_id": 0}), True
+    
+    existing = await db.idempotency_keys.find_one(selector, {"_id": 0})
+    if existing and (existing.get("response") is not None or existing["request_hash"] != request_hash):
+        return replay(existing)
+    
+    record, taken_over = await reserve(existing is not None)
+    if record is None:
+        existing = await db.idempotency_keys.find_one(selector, {"_id": 0})
+        if existing:
+            return replay(existing)
+        raise HTTPException(status_code=409, detail="Aynı Idempotency-Key ile istek hâlâ işleniyor")
+    owned = {**selector, "lease_id": record["lease_id"]}
+    resource_id = record.get("resource_id") or str(uuid.uuid4())
+    
+    async def find_written() -> Optional[dict]:
+        return await db[endpoint].find_one({"id": resource_id}, {"_id": 0})
+    
+    async def release(cancelled: bool):
+        if not cancelled and not await find_written():
+            # Kayıt yazılmadan başarısız oldu: aynı anahtarla düzeltilmiş istek yeniden denenebilir
+            await db.idempotency_keys.delete_one(owned)
+        else:
+            await db.idempotency_keys.update_one(owned, {"$set": {"locked_until": datetime.now(timezone.utc)}})
+    
+    try:
+        written = await find_written() if taken_over else None
+        if written:
+            result = model(**written)
+        else:
+            try:
+                result = await handler(resource_id)
+            except DuplicateKeyError:
+                # İptal edilen önceki denemenin insert'ü geç tamamlandı
+                written = await find_written()
+                if not written:
+                    raise
+                result = model(**written)
+    except BaseException as e:
+        # Temizlik ayrı task'ta tamamlanır; istek iptal edilse de kayıt kilitli kalmaz
+        await asyncio.shield(release(isinstance(e, asyncio.CancelledError)))
+        raise
+    await db.idempotency_keys.update_one(owned, {"$set": {"response": result.model_dump(mode="json")}})
+    return result
+
 # ============ SALES ============
 
-@api_router.get("/sales", response_model=List[Sale])
-async def get_sales(current_user: dict = Depends(get_current_user)):
+@api_router.get("/sales", response_model=Union[List[Sale], Page[Sale]])
+async def get_sales(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     query = {}
     if current_user["role"] == "salesperson":
         query = {"salesperson_id": current_user["id"]}
     elif current_user["role"] == "regional_manager":
-        team_users = await db.users.find({"region_id": current_user.get("region_id"), "role": "salesperson"}, {"_id": 0}).to_list(100)
-        team_ids = [u["id"] for u in team_users]
+        team_ids = await get_team_ids(current_user.get("region_id"))
         query = {"salesperson_id": {"$in": team_ids}}
     
-    sales = await db.sales.find(query, {"_id": 0}).to_list(10000)
-    return sales
+    return await find_list_or_page(db.sales, query, Sale, limit, cursor, 10000, fields=fields)
 
 @api_router.post("/sales", response_model=Sale)
-async def create_sale(sale: SaleCreate, current_user: dict = Depends(get_current_user)):
-    sale_obj = Sale(**sale.model_dump(), salesperson_id=current_user["id"])
+async def create_sale(sale: SaleCreate, idempotency_key: Optional[str] = Header(None, max_length=255),
+                      current_user: dict = Depends(get_current_user)):
+    return await run_idempotent(
+        idempotency_key, "sales", current_user, sale, Sale, lambda sale_id: record_sale(sale, current_user, sale_id)
+    )
+
+async def record_sale(sale: SaleCreate, current_user: dict, sale_id: Optional[str] = None) -> Sale:
+    sale_obj = Sale(**sale.model_dump(), salesperson_id=current_user["id"], **({"id": sale_id} if sale_id else {}))
     await db.sales.insert_one(sale_obj.model_dump())
+    await increment_sales_rollup(
+        sale_obj.salesperson_id, current_user.get("region_id"), rollup_month(sale_obj.created_at),
+        sales_count=1, sales_amount=sale_obj.total_amount
+    )
+    await increment_customer_balance(
+        sale_obj.customer_id, sales_amount=sale_obj.total_amount, sale_day=ledger_day(sale_obj.sale_date)
+    )
+    invalidate_response_cache(
+        sale_obj.salesperson_id, (current_user.get("region_id"),), months=(rollup_month(sale_obj.sale_date),)
+    )
+    await publish_dashboard_delta(
+        sale_obj.salesperson_id, current_user.get("region_id"), rollup_month(sale_obj.created_at),
+        sales_count=1, sales_amount=sale_obj.total_amount
+    )
     return sale_obj
 
 @api_router.get("/sales/commission")
@@ -940,15 +2431,19 @@ async def get_commission_data(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "salesperson":
         raise HTTPException(status_code=403, detail="Sadece plasiyerler prim bilgisini görebilir")
     
-    now = datetime.now(timezone.utc)
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
+    cache_key = response_cache_key("commission", current_user)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    my_sales = await db.sales.find({
-        "salesperson_id": current_user["id"],
-        "created_at": {"$gte": start_of_month}
-    }).to_list(10000)
+    month = rollup_month(datetime.now(timezone.utc).isoformat())
+    rollups = await db.sales_rollups.find(
+        {"salesperson_id": current_user["id"], "month": month},
+        {"_id": 0, "sales_count": 1, "sales_amount": 1}
+    ).to_list(100)
     
-    monthly_total = sum([s["total_amount"] for s in my_sales])
+    monthly_total = sum([r.get("sales_amount", 0) for r in rollups])
+    sales_count = sum([r.get("sales_count", 0) for r in rollups])
     
     emoji = "🌱"
     level = "Başlangıç"
@@ -962,32 +2457,54 @@ async def get_commission_data(current_user: dict = Depends(get_current_user)):
         emoji = "💪"
         level = "Güçlü"
     
-    return {
+    commission = {
         "monthly_total": monthly_total,
         "emoji": emoji,
         "level": level,
-        "sales_count": len(my_sales)
+        "sales_count": sales_count
     }
+    response_cache.set(cache_key, commission)
+    return commission
 
 # ============ COLLECTIONS ============
 
-@api_router.get("/collections", response_model=List[Collection])
-async def get_collections(current_user: dict = Depends(get_current_user)):
+@api_router.get("/collections", response_model=Union[List[Collection], Page[Collection]])
+async def get_collections(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     query = {}
     if current_user["role"] == "salesperson":
         query = {"salesperson_id": current_user["id"]}
     elif current_user["role"] == "regional_manager":
-        team_users = await db.users.find({"region_id": current_user.get("region_id"), "role": "salesperson"}, {"_id": 0}).to_list(100)
-        team_ids = [u["id"] for u in team_users]
+        team_ids = await get_team_ids(current_user.get("region_id"))
         query = {"salesperson_id": {"$in": team_ids}}
     
-    collections = await db.collections.find(query, {"_id": 0}).to_list(10000)
-    return collections
+    return await find_list_or_page(db.collections, query, Collection, limit, cursor, 10000, fields=fields)
 
 @api_router.post("/collections", response_model=Collection)
-async def create_collection(collection: CollectionCreate, current_user: dict = Depends(get_current_user)):
-    collection_obj = Collection(**collection.model_dump(), salesperson_id=current_user["id"])
+async def create_collection(collection: CollectionCreate, idempotency_key: Optional[str] = Header(None, max_length=255),
+                            current_user: dict = Depends(get_current_user)):
+    return await run_idempotent(
+        idempotency_key, "collections", current_user, collection, Collection,
+        lambda collection_id: record_collection(collection, current_user, collection_id)
+    )
+
+async def record_collection(collection: CollectionCreate, current_user: dict, collection_id: Optional[str] = None) -> Collection:
+    collection_obj = Collection(
+        **collection.model_dump(), salesperson_id=current_user["id"], **({"id": collection_id} if collection_id else {})
+    )
     await db.collections.insert_one(collection_obj.model_dump())
+    await increment_sales_rollup(
+        collection_obj.salesperson_id, current_user.get("region_id"), rollup_month(collection_obj.created_at),
+        collections_count=1, collections_amount=collection_obj.amount
+    )
+    await increment_customer_balance(collection_obj.customer_id, collections_amount=collection_obj.amount)
+    invalidate_response_cache(
+        collection_obj.salesperson_id, (current_user.get("region_id"),),
+        months=(rollup_month(collection_obj.collection_date),)
+    )
+    await publish_dashboard_delta(
+        collection_obj.salesperson_id, current_user.get("region_id"), rollup_month(collection_obj.created_at),
+        collections_amount=collection_obj.amount
+    )
     return collection_obj
 
 @api_router.delete("/collections/{collection_id}")
@@ -997,37 +2514,873 @@ async def delete_collection(collection_id: str, current_user: dict = Depends(get
     if current_user["role"] != "admin":
         query["salesperson_id"] = current_user["id"]
     
-    result = await db.collections.delete_one(query)
-    if result.deleted_count == 0:
+    deleted = await db.collections.find_one_and_delete(query, {"_id": 0})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Tahsilat bulunamadı veya silme yetkiniz yok")
+    await record_tombstone("collections", collection_id, salesperson_id=deleted["salesperson_id"])
+    
+    owner = await db.users.find_one({"id": deleted["salesperson_id"]}, {"_id": 0, "region_id": 1})
+    await increment_sales_rollup(
+        deleted["salesperson_id"], (owner or {}).get("region_id"), rollup_month(deleted["created_at"]),
+        collections_count=-1, collections_amount=-deleted["amount"]
+    )
+    await increment_customer_balance(deleted["customer_id"], collections_amount=-deleted["amount"])
+    invalidate_response_cache(
+        deleted["salesperson_id"], ((owner or {}).get("region_id"),), months=(rollup_month(deleted["collection_date"]),)
+    )
+    await publish_dashboard_delta(
+        deleted["salesperson_id"], (owner or {}).get("region_id"), rollup_month(deleted["created_at"]),
+        collections_amount=-deleted["amount"]
+    )
     return {"message": "Tahsilat başarıyla silindi"}
 
+# ============ RECEIVABLES ============
+# customer_balances: müşteri başına açık bakiye (satış - tahsilat). Yazma işlemlerinde $inc ile
+# güncellenir; sales_by_day (YYYY-MM-DD -> tutar) yaşlandırma için satışların gün dağılımını tutar.
+
+AGING_BUCKETS = (("0-30", 30), ("31-60", 60), ("61-90", 90), ("90+", None))
+LEDGER_DAY_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def ledger_day(sale_date: str) -> Optional[str]:
+    """Yaşlandırma günü; tarih biçimi tanınmayan veya takvimde olmayan (2026-02-30) satışlar
+    gün dağılımına girmez (90+ sayılır)"""
+    day = (sale_date or "")[:10]
+    if not LEDGER_DAY_PATTERN.match(day):
+        return None
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        return None
+    return day
+
+def invalidate_receivables_cache():
+    """Bakiye değişince yaşlandırma özetlerini temizle - kapsam müşterinin bölgesi olduğundan
+    yazan plasiyerin kapsamıyla eşleşmez, tüm kapsamlar birlikte düşürülür"""
+    response_cache.invalidate(lambda key: key[0] == "receivables_aging")
+
+async def increment_customer_balance(customer_id: str, sales_amount: float = 0, collections_amount: float = 0,
+                                     sale_day: Optional[str] = None):
+    """Bakiye dokümanını atomik $inc ile güncelle; ilk oluşturulduğunda müşteri ad/bölgesini kopyala"""
+    increments = {
+        "sales_amount": sales_amount,
+        "collections_amount": collections_amount,
+        "balance": sales_amount - collections_amount
+    }
+    if sale_day and sales_amount:
+        increments[f"sales_by_day.{sale_day}"] = sales_amount
+    result = await db.customer_balances.update_one(
+        {"customer_id": customer_id},
+        {"$inc": increments, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
+    invalidate_receivables_cache()
+    if result.upserted_id is not None:
+        customer = await db.customers.find_one({"id": customer_id}, {"_id": 0, "name": 1, "region_id": 1})
+        await db.customer_balances.update_one(
+            {"customer_id": customer_id},
+            {"$set": {"customer_name": (customer or {}).get("name"), "region_id": (customer or {}).get("region_id")}}
+        )
+
+async def bulk_increment_customer_balances(increments: Dict[str, Dict[str, float]]):
+    """customer_id -> {alan: artış} eşlemesini tek bulk_write ile uygula; yeni dokümanlara ad/bölge kopyala"""
+    if not increments:
+        return
+    customer_ids = list(increments)
+    now = datetime.now(timezone.utc).isoformat()
+    result = await db.customer_balances.bulk_write([
+        UpdateOne({"customer_id": customer_id}, {"$inc": increments[customer_id], "$set": {"updated_at": now}}, upsert=True)
+        for customer_id in customer_ids
+    ], ordered=False)
+    invalidate_receivables_cache()
+    created = [customer_ids[index] for index in result.upserted_ids]
+    if created:
+        customers = await db.customers.find(
+            {"id": {"$in": created}}, {"_id": 0, "id": 1, "name": 1, "region_id": 1}
+        ).to_list(None)
+        if customers:
+            await db.customer_balances.bulk_write([
+                UpdateOne(
+                    {"customer_id": customer["id"]},
+                    {"$set": {"customer_name": customer.get("name"), "region_id": customer.get("region_id")}}
+                )
+                for customer in customers
+            ], ordered=False)
+
+def age_receivable(balance: float, sales_by_day: dict, today: date) -> dict:
+    """Açık bakiyeyi yaş kovalarına dağıt
+    
+    Tahsilatlar en eski borcu kapatır (FIFO); bu yüzden açık bakiye en yeni satışlardan
+    geriye doğru dağıtılır. Günü bilinmeyen kalan kısım 90+ kovasına yazılır.
+    """
+    buckets = {name: 0.0 for name, _ in AGING_BUCKETS}
+    remaining = balance
+    for day in sorted(sales_by_day, reverse=True):
+        if remaining <= 0:
+            break
+        portion = min(remaining, sales_by_day[day])
+        if portion <= 0 or ledger_day(day) != day:
+            continue
+        age = (today - date.fromisoformat(day)).days
+        bucket = next(name for name, limit in AGING_BUCKETS if limit is None or age <= limit)
+        buckets[bucket] += portion
+        remaining -= portion
+    if remaining > 0:
+        buckets["90+"] += remaining
+    return {name: round(amount, 2) for name, amount in buckets.items()}
+
+def prune_sales_by_day(balance: float, sales_by_day: dict) -> dict:
+    """Açık bakiyeyi karşılayan en yeni günleri tut; kapanmış eski satış günleri yaşlandırmayı etkilemez"""
+    kept, covered = {}, 0.0
+    for day in sorted(sales_by_day, reverse=True):
+        if covered >= balance:
+            break
+        kept[day] = sales_by_day[day]
+        covered += sales_by_day[day]
+    return kept
+
+async def rebuild_customer_balances() -> int:
+    """customer_balances koleksiyonunu sales/collections'tan yeniden hesapla (mutabakat)
+    
+    Silinmiş müşterilere ait satış/tahsilatlar atlanır; bakiye sadece db.customers'taki kayıtlar için yazılır.
+    """
+    sales_groups = await db.sales.aggregate([
+        {"$group": {
+            "_id": {"customer_id": "$customer_id", "day": {"$substrCP": ["$sale_date", 0, 10]}},
+            "amount": {"$sum": "$total_amount"}
+        }}
+    ]).to_list(None)
+    collection_groups = await db.collections.aggregate([
+        {"$group": {"_id": "$customer_id", "amount": {"$sum": "$amount"}}}
+    ]).to_list(None)
+    customers = await db.customers.find({}, {"_id": 0, "id": 1, "name": 1, "region_id": 1}).to_list(None)
+    customer_info = {c["id"]: c for c in customers}
+    
+    now = datetime.now(timezone.utc).isoformat()
+    balances: Dict[str, dict] = {}
+    
+    def balance_doc(customer_id: str) -> dict:
+        info = customer_info.get(customer_id, {})
+        return balances.setdefault(customer_id, {
+            "customer_id": customer_id,
+            "customer_name": info.get("name"),
+            "region_id": info.get("region_id"),
+            "sales_amount": 0,
+            "collections_amount": 0,
+            "balance": 0,
+            "sales_by_day": {},
+            "updated_at": now
+        })
+    
+    orphaned = {g["_id"]["customer_id"] for g in sales_groups} | {g["_id"] for g in collection_groups}
+    orphaned -= customer_info.keys()
+    sales_groups = [g for g in sales_groups if g["_id"]["customer_id"] in customer_info]
+    collection_groups = [g for g in collection_groups if g["_id"] in customer_info]
+    
+    for g in sales_groups:
+        doc = balance_doc(g["_id"]["customer_id"])
+        doc["sales_amount"] += g["amount"]
+        day = ledger_day(g["_id"]["day"])
+        if day:
+            doc["sales_by_day"][day] = doc["sales_by_day"].get(day, 0) + g["amount"]
+    for g in collection_groups:
+        balance_doc(g["_id"])["collections_amount"] += g["amount"]
+    for doc in balances.values():
+        doc["balance"] = doc["sales_amount"] - doc["collections_amount"]
+        doc["sales_by_day"] = prune_sales_by_day(doc["balance"], doc["sales_by_day"])
+    
+    operations = [DeleteMany({})] + [
+        ReplaceOne({"customer_id": doc["customer_id"]}, doc, upsert=True) for doc in balances.values()
+    ]
+    await db.customer_balances.bulk_write(operations, ordered=True)
+    invalidate_receivables_cache()
+    logger.info(f"Müşteri bakiyeleri yeniden hesaplandı: {len(balances)} kayıt")
+    if orphaned:
+        logger.warning(f"Silinmiş müşterilere ait hareketler bakiyeye alınmadı: {len(orphaned)} müşteri")
+    return len(balances)
+
+def receivables_scope(current_user: dict) -> dict:
+    """Müşteri listesiyle aynı kapsam: bölge müdürü kendi bölgesi, diğerleri tümü"""
+    if current_user["role"] == "regional_manager":
+        return {"region_id": current_user.get("region_id")}
+    return {}
+
+def receivables_cache_key(current_user: dict) -> tuple:
+    """Anahtar rol değil kapsam: plasiyer ve admin aynı (tüm müşteriler) özeti paylaşır"""
+    scope = receivables_scope(current_user)
+    return ("receivables_aging", scope["region_id"]) if scope else ("receivables_aging", "*")
+
+def balance_row(doc: dict, today: date) -> dict:
+    return {
+        "customer_id": doc["customer_id"],
+        "customer_name": doc.get("customer_name"),
+        "region_id": doc.get("region_id"),
+        "sales_amount": round(doc.get("sales_amount", 0), 2),
+        "collections_amount": round(doc.get("collections_amount", 0), 2),
+        "balance": round(doc.get("balance", 0), 2),
+        "aging": age_receivable(doc.get("balance", 0), doc.get("sales_by_day", {}), today)
+    }
+
+@api_router.get("/receivables")
+async def get_receivables(limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), current_user: dict = Depends(get_current_user)):
+    """En yüksek açık bakiyeli müşteriler (balance index'i üzerinden)"""
+    query = {**receivables_scope(current_user), "balance": {"$gt": 0}}
+    docs = await db.customer_balances.find(query, {"_id": 0}).sort("balance", -1).limit(limit).to_list(limit)
+    today = datetime.now(timezone.utc).date()
+    return ORJSONResponse([balance_row(doc, today) for doc in docs])
+
+@api_router.get("/receivables/aging")
+async def get_receivables_aging(current_user: dict = Depends(get_current_user)):
+    """Kapsamdaki toplam açık bakiyenin yaş kovalarına dağılımı"""
+    cache_key = receivables_cache_key(current_user)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    query = {**receivables_scope(current_user), "balance": {"$gt": 0}}
+    docs = await db.customer_balances.find(
+        query, {"_id": 0, "balance": 1, "sales_by_day": 1}
+    ).to_list(None)
+    today = datetime.now(timezone.utc).date()
+    totals = {name: 0.0 for name, _ in AGING_BUCKETS}
+    for doc in docs:
+        for name, amount in age_receivable(doc["balance"], doc.get("sales_by_day", {}), today).items():
+            totals[name] += amount
+    
+    result = {
+        "as_of": today.isoformat(),
+        "customer_count": len(docs),
+        "total_balance": round(sum(doc["balance"] for doc in docs), 2),
+        "buckets": {name: round(amount, 2) for name, amount in totals.items()}
+    }
+    response_cache.set(cache_key, result)
+    return result
+
+@api_router.get("/customers/{customer_id}/balance")
+async def get_customer_balance(customer_id: str, current_user: dict = Depends(get_current_user)):
+    doc = await db.customer_balances.find_one({"customer_id": customer_id, **receivables_scope(current_user)}, {"_id": 0})
+    if not doc:
+        doc = {"customer_id": customer_id}
+    return balance_row(doc, datetime.now(timezone.utc).date())
+
+# ============ OFFLINE SYNC ============
+
+def validation_detail(error: ValidationError) -> str:
+    """Pydantic hatalarını tek satırlık, JSON'a yazılabilir mesaja çevir"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+def add_increments(target: dict, key, **fields):
+    entry = target.setdefault(key, {})
+    for field, value in fields.items():
+        entry[field] = entry.get(field, 0) + value
+
+async def insert_batch(collection, docs: List[dict]) -> Dict[int, dict]:
+    """insert_many(ordered=False) - yazılamayan kayıtların sırası -> writeError (code, errmsg)"""
+    if not docs:
+        return {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+        return {}
+    except BulkWriteError as e:
+        return {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+# client_id'den kayıt id'si türetmek için; kullanıcı id'si ile birlikte hashlenir, kullanıcılar çakışmaz
+SYNC_CLIENT_ID_NAMESPACE = uuid.UUID("6f1c2d7e-3b4a-5c8d-9e0f-a1b2c3d4e5f6")
+
+def sync_record_id(salesperson_id: str, client_id: Any) -> str:
+    """Cihazın ürettiği client_id'yi kayıt id'sine çevir - aynı kayıt her gönderimde aynı id'yi alır"""
+    return str(uuid.uuid5(SYNC_CLIENT_ID_NAMESPACE, f"{salesperson_id}:{client_id}"))
+
+@api_router.post("/sync/batch")
+async def sync_batch(batch: SyncBatch, current_user: dict = Depends(get_current_user)):
+    """Offline kaydedilen ziyaret/satış/tahsilatları tek istekte yaz
+    
+    Her kayıt kendi Create modeliyle doğrulanır; koleksiyon başına tek insert_many(ordered=False),
+    rollup ve müşteri bakiyesi artışları birer bulk_write ile uygulanır.
+    Kayıtlar cihazın ürettiği "client_id" ile gönderilirse id ondan türetilir; yanıtı kaybolan bir
+    gönderimin tekrarı unique id index'ine takılır ve yan etkileri (rollup, bakiye) ikinci kez uygulanmaz.
+    Yanıt: {"visits": [...], "sales": [...], "collections": [...]} - kayıt başına
+    {"index", "status": "created" | "duplicate", "id"} veya {"index", "status": "error", "detail"}.
+    """
+    total = len(batch.visits) + len(batch.sales) + len(batch.collections)
+    if total > SYNC_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Tek istekte en fazla {SYNC_BATCH_MAX_ITEMS} kayıt gönderilebilir")
+    
+    salesperson_id = current_user["id"]
+    region_id = current_user.get("region_id")
+    
+    async def prepare_visit(item: dict) -> Visit:
+        visit_data = VisitCreate.model_validate({**item, "salesperson_id": salesperson_id}).model_dump()
+        await ingest_image(visit_data, "photo_base64", "photo_blob", "photo_thumb_blob")
+        return Visit(**visit_data)
+    
+    async def prepare_sale(item: dict) -> Sale:
+        return Sale(**SaleCreate.model_validate(item).model_dump(), salesperson_id=salesperson_id)
+    
+    async def prepare_collection(item: dict) -> Collection:
+        return Collection(**CollectionCreate.model_validate(item).model_dump(), salesperson_id=salesperson_id)
+    
+    async def prepare_one(prepare, item: dict):
+        try:
+            return await prepare(item), None
+        except ValidationError as e:
+            return None, validation_detail(e)
+        except HTTPException as e:
+            return None, e.detail
+    
+    kinds = (
+        ("visits", db.visits, prepare_visit, batch.visits),
+        ("sales", db.sales, prepare_sale, batch.sales),
+        ("collections", db.collections, prepare_collection, batch.collections),
+    )
+    results = {}
+    created = {}
+    for kind, collection, prepare, items in kinds:
+        record_ids = {
+            index: sync_record_id(salesperson_id, item["client_id"])
+            for index, item in enumerate(items) if item.get("client_id")
+        }
+        existing = set()
+        if record_ids:
+            cursor = collection.find({"id": {"$in": list(record_ids.values())}}, {"_id": 0, "id": 1})
+            existing = {doc["id"] async for doc in cursor}
+        
+        kind_results, valid = [], []
+        for index, item in enumerate(items):
+            record_id = record_ids.get(index)
+            if record_id in existing:
+                # Tekrar gönderim: fotoğraf yeniden işlenmez, yan etkiler uygulanmaz
+                kind_results.append({"index": index, "status": "duplicate", "id": record_id})
+                continue
+            # Sırayla: ziyaret fotoğrafları aynı anda çözülüp belleği doldurmasın
+            obj, detail = await prepare_one(prepare, item)
+            if obj is None:
+                kind_results.append({"index": index, "status": "error", "detail": detail})
+                continue
+            if record_id:
+                obj.id = record_id
+            valid.append((index, obj))
+        
+        failed = await insert_batch(collection, [obj.model_dump() for _, obj in valid])
+        created[kind] = []
+        for position, (index, obj) in enumerate(valid):
+            error = failed.get(position)
+            if error and error.get("code") == 11000:
+                # Eşzamanlı tekrar veya aynı istekte aynı client_id
+                kind_results.append({"index": index, "status": "duplicate", "id": obj.id})
+            elif error:
+                kind_results.append({"index": index, "status": "error", "detail": error.get("errmsg", "Yazma hatası")})
+            else:
+                kind_results.append({"index": index, "status": "created", "id": obj.id})
+                created[kind].append(obj)
+        results[kind] = sorted(kind_results, key=lambda result: result["index"])
+    
+    # Tekil endpoint'lerle aynı yan etkiler, toplu olarak
+    rollups, balances, months = {}, {}, set()
+    for sale in created["sales"]:
+        add_increments(rollups, (salesperson_id, region_id, rollup_month(sale.created_at)),
+                       sales_count=1, sales_amount=sale.total_amount)
+        day = ledger_day(sale.sale_date)
+        add_increments(balances, sale.customer_id, sales_amount=sale.total_amount, balance=sale.total_amount,
+                       **({f"sales_by_day.{day}": sale.total_amount} if day else {}))
+        months.add(rollup_month(sale.sale_date))
+    for collection_obj in created["collections"]:
+        add_increments(rollups, (salesperson_id, region_id, rollup_month(collection_obj.created_at)),
+                       collections_count=1, collections_amount=collection_obj.amount)
+        add_increments(balances, collection_obj.customer_id,
+                       collections_amount=collection_obj.amount, balance=-collection_obj.amount)
+        months.add(rollup_month(collection_obj.collection_date))
+    
+    await gather_queries(
+        "sync_batch",
+        rollups=bulk_increment_sales_rollups(rollups),
+        balances=bulk_increment_customer_balances(balances)
+    )
+    if any(created.values()):
+        invalidate_response_cache(salesperson_id, (region_id,), months=tuple(months))
+    # Canlı dashboard: ay başına tek olay
+    live_increments = {key: dict(fields) for key, fields in rollups.items()}
+    for visit_obj in created["visits"]:
+        add_increments(live_increments, (salesperson_id, region_id, rollup_month(visit_obj.created_at)), visits=1)
+    for (_, _, month), fields in live_increments.items():
+        await publish_dashboard_delta(salesperson_id, region_id, month, **fields)
+    
+    created_count = sum(len(objs) for objs in created.values())
+    duplicate_count = sum(
+        1 for kind_results in results.values() for result in kind_results if result["status"] == "duplicate"
+    )
+    logger.info(
+        f"Offline senkronizasyon: {created_count}/{total} kayıt yazıldı, {duplicate_count} tekrar ({salesperson_id})"
+    )
+    return {**results, "created": created_count, "duplicate": duplicate_count,
+            "failed": total - created_count - duplicate_count}
+
+# Delta senkronizasyon: her koleksiyonun kayıtları (updated_at, id) sırasıyla okunur,
+# hard delete'ler tombstones koleksiyonundan gelir. Token istemciye opak, son konumları taşır.
+
+# koleksiyon -> (yanıt modeli, hariç tutulan alanlar)
+SYNC_SOURCES = {
+    "customers": (Customer, ()),
+    "products": (Product, ("photo_base64",)),
+    "regions": (Region, ()),
+    "visits": (Visit, ("photo_base64",)),
+    "sales": (Sale, ()),
+    "collections": (Collection, ()),
+    "users": (UserResponse, ()),
+}
+
+async def record_tombstone(collection: str, doc_id: str, **scope):
+    """Hard delete'i sync akışına yaz; scope alanları (region_id/salesperson_id) rol kapsamı için"""
+    await db.tombstones.insert_one({
+        "id": doc_id,
+        "collection": collection,
+        **scope,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "deleted_at": datetime.now(timezone.utc)  # TTL index
+    })
+
+async def backfill_updated_at() -> int:
+    """updated_at alanı olmayan eski kayıtlara created_at değerini yaz (sync akışına girebilmeleri için)"""
+    total = 0
+    for name in SYNC_SOURCES:
+        result = await db[name].update_many(
+            {"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$created_at"}}]
+        )
+        total += result.modified_count
+    return total
+
+# run_data_migrations ile startup'ta bir kez çalışır.
+# STARTUP_DATA_MIGRATIONS istekler kabul edilmeden önce, DATA_MIGRATIONS arka planda.
+STARTUP_DATA_MIGRATIONS = {
+    "sales_rollups_backfill": rebuild_sales_rollups,
+    "customer_balances_backfill": rebuild_customer_balances,
+}
+
+# Liste endpoint'leri photo_base64'ü döndürmez; eski inline fotoğraflar blob'a taşınmadan listelerde görünmez
+DATA_MIGRATIONS = {
+    "inline_blobs": migrate_inline_blobs,
+    "updated_at_backfill": backfill_updated_at,
+}
+
+async def sync_scopes(current_user: dict) -> Dict[str, dict]:
+    """Kullanıcının görebildiği koleksiyonlar ve filtreleri - liste endpoint'leriyle aynı kapsam"""
+    record_scope = await report_scope_query(current_user)
+    region_scope = {"region_id": current_user.get("region_id")} if current_user["role"] == "regional_manager" else {}
+    scopes = {
+        "customers": region_scope,
+        "products": {},
+        "regions": {},
+        "visits": record_scope,
+        "sales": record_scope,
+        "collections": record_scope,
+    }
+    if current_user["role"] in ("admin", "regional_manager"):
+        scopes["users"] = region_scope
+    return scopes
+
+def encode_sync_token(state: dict) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_sync_token(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(state.get("positions"), dict) or not isinstance(state.get("issued_at"), str):
+            raise ValueError
+        # Her konum [updated_at, id] - after_position bu şekli varsayar
+        for position in state["positions"].values():
+            if not (isinstance(position, list) and len(position) == 2 and all(isinstance(part, str) for part in position)):
+                raise ValueError
+        return state
+    except (ValueError, TypeError, AttributeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Geçersiz sync token")
+
+def after_position(position: list) -> dict:
+    updated_at, doc_id = position
+    return {"$or": [
+        {"updated_at": {"$gt": updated_at}},
+        {"updated_at": updated_at, "id": {"$gt": doc_id}}
+    ]}
+
+@api_router.get("/sync")
+async def get_sync_changes(
+    since: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """since token'ından bu yana değişen kayıtlar ve silinen id'ler
+    
+    since verilmezse tam senkronizasyon (tüm kayıtlar). Bir koleksiyonda limit'ten fazla değişiklik
+    varsa has_more true döner; istemci next token'ı ile tekrar çağırır. Tombstone saklama süresinden
+    eski token'lar 410 alır ve tam senkronizasyon yapmalıdır.
+    """
+    now = datetime.now(timezone.utc)
+    if since:
+        state = decode_sync_token(since)
+        if state["issued_at"] < (now - timedelta(days=TOMBSTONE_RETENTION_DAYS)).isoformat():
+            raise HTTPException(status_code=410, detail="Sync token süresi dolmuş, tam senkronizasyon gerekli")
+    else:
+        state = {"positions": {}}
+    positions = state["positions"]
+    horizon = [(now - timedelta(seconds=SYNC_SAFETY_SECONDS)).isoformat(), ""]
+    scopes = await sync_scopes(current_user)
+    
+    def changes_query(name: str, model, exclude: tuple, scope: dict):
+        query = {**scope, **after_position(positions.get(name, ["", ""]))}
+        return db[name].find(query, trusted_serializer(model, exclude).projection).sort(
+            [("updated_at", 1), ("id", 1)]
+        ).limit(limit + 1).to_list(limit + 1)
+    
+    queries = {
+        name: changes_query(name, *SYNC_SOURCES[name], scope) for name, scope in scopes.items()
+    }
+    if since:
+        tombstone_query = {"$and": [
+            {"$or": [{"collection": name, **scope} for name, scope in scopes.items()]},
+            after_position(positions.get("tombstones", ["", ""]))
+        ]}
+        queries["tombstones"] = db.tombstones.find(
+            tombstone_query, {"_id": 0, "id": 1, "collection": 1, "updated_at": 1}
+        ).sort([("updated_at", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1)
+    results = await gather_queries("sync", **queries)
+    
+    has_more = False
+    next_positions = {}
+    for name, docs in results.items():
+        previous = positions.get(name, ["", ""])
+        if len(docs) > limit:
+            has_more = True
+            docs = results[name] = docs[:limit]
+            next_positions[name] = [docs[-1]["updated_at"], docs[-1]["id"]]
+        else:
+            last = [docs[-1]["updated_at"], docs[-1]["id"]] if docs else previous
+            # Tamamen okunan koleksiyonda konum güvenlik penceresinin ötesine geçmez
+            next_positions[name] = min(last, horizon)
+    if not since:
+        next_positions["tombstones"] = horizon
+    
+    deleted = {name: [] for name in scopes}
+    for tombstone in results.pop("tombstones", []):
+        deleted[tombstone["collection"]].append(tombstone["id"])
+    
+    return ORJSONResponse({
+        "changes": {
+            name: trusted_serializer(*SYNC_SOURCES[name]).prepare(docs) for name, docs in results.items()
+        },
+        "deleted": deleted,
+        "has_more": has_more,
+        "next": encode_sync_token({"positions": next_positions, "issued_at": now.isoformat()})
+    })
+
 # ============ DOCUMENTS ============
 
-@api_router.get("/documents", response_model=List[Document])
-async def get_documents(current_user: dict = Depends(get_current_user)):
-    documents = await db.documents.find({}, {"_id": 0}).to_list(1000)
-    return documents
+@api_router.get("/documents", response_model=Union[List[Document], Page[Document]])
+async def get_documents(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    return await find_list_or_page(db.documents, {}, Document, limit, cursor, 1000, exclude=("file_base64",), fields=fields)
 
 @api_router.post("/documents", response_model=Document)
 async def create_document(document: DocumentCreate, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Sadece admin doküman ekleyebilir")
-    document_obj = Document(**document.model_dump())
+    document_data = document.model_dump()
+    await extract_blob(document_data, "file_base64", "file_blob", document.file_type)
+    document_obj = Document(**document_data)
     await db.documents.insert_one(document_obj.model_dump())
     return document_obj
 
+@api_router.get("/documents/{document_id}/file")
+async def download_document_file(document_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Doküman dosyasını indir - ETag/Range destekli"""
+    document = await db.documents.find_one({"id": document_id}, {"_id": 0, "file_blob": 1, "file_name": 1})
+    if not document or not document.get("file_blob"):
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı")
+    meta = await db.blobs.find_one({"hash": document["file_blob"]}, {"_id": 0})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı")
+    return blob_response(request, meta, filename=document.get("file_name"))
+
+# ============ BLOBS ============
+
+BLOB_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# İçerik hash ile adreslendiği için değişmez: uzun süreli cache güvenli (yetkili içerik -> private)
+BLOB_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def parse_range_header(range_header: str, size: int) -> Optional[tuple]:
+    """Tek aralıklı 'bytes=start-end' / 'bytes=start-' / 'bytes=-suffix' -> (start, end) dahil
+    
+    Desteklenmeyen biçimlerde None (tam içerik), karşılanamayan aralıkta 416.
+    """
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', range_header)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.group(1), match.group(2)
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416, detail="İstenen aralık karşılanamıyor",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+ASCII_FALLBACK_LETTERS = str.maketrans("ıİ", "iI")
+
+def content_disposition(filename: str) -> str:
+    """attachment başlığı: eski istemciler için ASCII filename, diğerleri için RFC 5987 filename*
+    
+    Starlette başlıkları latin-1 ile kodlar; Türkçe karakterli ad doğrudan yazılırsa 500 döner.
+    """
+    # ı/İ NFKD ile ayrışmaz; diğer Türkçe harfler aksanı atılarak ASCII'ye iner
+    ascii_name = unicodedata.normalize("NFKD", filename.translate(ASCII_FALLBACK_LETTERS))
+    ascii_name = ascii_name.encode("ascii", "ignore").decode("ascii")
+    ascii_name = re.sub(r'[\x00-\x1f\x7f"\\]', "_", ascii_name).strip() or "download"
+    return f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{quote(filename, safe="")}'
+
+def blob_response(request: Request, meta: dict, filename: Optional[str] = None):
+    """ETag/If-None-Match (304), Range (206) ve immutable Cache-Control ile blob yanıtı"""
+    etag = f'"{meta["hash"]}"'
+    headers = {"ETag": etag, "Cache-Control": BLOB_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = content_disposition(filename)
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    size = meta["size"]
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range_header(range_header, size)
+    
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(blob_store.stream(meta["hash"]), media_type=meta["content_type"], headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.stream(meta["hash"], start, end - start + 1),
+        status_code=206, media_type=meta["content_type"], headers=headers
+    )
+
+@api_router.get("/blobs/{blob_hash}")
+async def download_blob(blob_hash: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Fotoğraf/dosya içeriğini akıt"""
+    if not BLOB_HASH_PATTERN.match(blob_hash):
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı")
+    meta = await db.blobs.find_one({"hash": blob_hash}, {"_id": 0})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı")
+    return blob_response(request, meta)
+
 # ============ REPORTS ============
 
+REPORT_FORMAT_PATTERN = "^(json|ndjson|csv)$"
+
+REPORT_CSV_COLUMNS = {
+    "sales": ["id", "sale_date", "customer_id", "salesperson_id", "total_amount", "notes", "created_at"],
+    "visits": ["id", "visit_date", "customer_id", "salesperson_id", "status", "notes", "created_at"],
+}
+
+def stream_report(name: str, cursor, output_format: str, amount_field: Optional[str] = None,
+                  fields: Optional[tuple] = None, hidden: tuple = ()) -> StreamingResponse:
+    """Motor cursor'ını batch'ler halinde NDJSON/CSV olarak akıt; toplamlar en sonda (trailer)
+    
+    NDJSON: her satır bir kayıt, son satır {"summary": {...}}
+    CSV: başlık + kayıtlar, boş satırdan sonra "total_count,<n>" (ve varsa "total_amount,<x>")
+    fields verilirse CSV sütunları bu alanlarla sınırlanır; hidden alanlar satırlardan atılır.
+    """
+    import csv  # Sadece rapor akışında gerekli
+    
+    columns = REPORT_CSV_COLUMNS[name]
+    if fields is not None:
+        columns = [column for column in columns if column in fields] + [
+            column for column in fields if column not in columns
+        ]
+    
+    def csv_line(values) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()
+    
+    async def generate():
+        total_count = 0
+        total_amount = 0
+        chunk = []
+        if output_format == "csv":
+            chunk.append(csv_line(columns))
+        async for doc in cursor.batch_size(REPORT_STREAM_BATCH_SIZE):
+            total_count += 1
+            if amount_field:
+                total_amount += doc.get(amount_field, 0)
+            drop_hidden(doc, hidden)
+            if output_format == "csv":
+                chunk.append(csv_line([doc.get(column, "") for column in columns]))
+            else:
+                chunk.append(json.dumps(doc, ensure_ascii=False, default=str) + "\n")
+            if len(chunk) >= REPORT_STREAM_BATCH_SIZE:
+                yield "".join(chunk)
+                chunk = []
+        
+        summary = {"total_count": total_count}
+        if amount_field:
+            summary["total_amount"] = total_amount
+        if output_format == "csv":
+            chunk.append("\r\n")
+            chunk.extend(csv_line([key, value]) for key, value in summary.items())
+        else:
+            chunk.append(json.dumps({"summary": summary}) + "\n")
+        yield "".join(chunk)
+    
+    if output_format == "csv":
+        return StreamingResponse(
+            generate(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{name}_report.csv"'}
+        )
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+TIMESERIES_GRANULARITY_PATTERN = "^(day|week|month)$"
+TIMESERIES_GROUP_PATTERN = "^(salesperson|region|payment_method)$"
+# kaynak -> (koleksiyon, tarih alanı, tutar alanı)
+TIMESERIES_SOURCES = {
+    "sales": ("sales", "sale_date", "total_amount"),
+    "collections": ("collections", "collection_date", "amount"),
+}
+MAX_REPORT_RANGE_DAYS = 366 * 5
+
+def parse_report_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[date, date]:
+    """Analitik tarih aralığı; varsayılan: içinde bulunulan ay dahil son 12 ay"""
+    try:
+        end = date.fromisoformat(end_date[:10]) if end_date else datetime.now(timezone.utc).date()
+        if start_date:
+            start = date.fromisoformat(start_date[:10])
+        else:
+            months_back = end.year * 12 + end.month - 1 - 11
+            start = date(months_back // 12, months_back % 12 + 1, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih formatı (YYYY-MM-DD)")
+    if start > end or (end - start).days > MAX_REPORT_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih aralığı")
+    return start, end
+
+def month_range(start: date, end: date) -> List[str]:
+    """start ve end'i kapsayan YYYY-MM listesi"""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + 1:04d}-01" if number == 12 else f"{year:04d}-{number + 1:02d}"
+
+async def cached_period_rows(scope_key: tuple, source: str, months: List[str], load) -> list:
+    """Ay bazlı analitik satırları: kapanmış aylar period_cache'ten, eksikler tek sorguyla
+    
+    load(first_month, last_month) her satırda "month" alanı olan bir liste döndürür.
+    İçinde bulunulan ay (ve sonrası) hiçbir zaman cache'lenmez.
+    """
+    current = rollup_month(datetime.now(timezone.utc).isoformat())
+    rows, missing = [], []
+    for month in months:
+        cached = period_cache.get((*scope_key, source, month)) if month < current else None
+        if cached is None:
+            missing.append(month)
+        else:
+            rows.extend(cached)
+    
+    if missing:
+        by_month = {month: [] for month in missing}
+        for row in await load(missing[0], missing[-1]):
+            if row["month"] in by_month:
+                by_month[row["month"]].append(row)
+        for month, month_rows in by_month.items():
+            if month < current:
+                period_cache.set((*scope_key, source, month), month_rows)
+            rows.extend(month_rows)
+    return rows
+
+def daily_totals_loader(source: str, scope: dict):
+    """(plasiyer, gün[, ödeme yöntemi]) bazında adet/tutar - haftalık/aylık kovalar bunlardan türetilir"""
+    collection_name, date_field, amount_field = TIMESERIES_SOURCES[source]
+    
+    async def load(first_month: str, last_month: str) -> list:
+        group_id = {"salesperson_id": "$salesperson_id", "day": {"$substrCP": [f"${date_field}", 0, 10]}}
+        if source == "collections":
+            group_id["payment_method"] = "$payment_method"
+        groups = await db[collection_name].aggregate([
+            {"$match": {**scope, date_field: {"$gte": first_month, "$lt": next_month(last_month)}}},
+            {"$group": {"_id": group_id, "count": {"$sum": 1}, "amount": {"$sum": f"${amount_field}"}}}
+        ]).to_list(None)
+        return [
+            {**group["_id"], "month": group["_id"]["day"][:7], "count": group["count"], "amount": group["amount"]}
+            for group in groups
+        ]
+    return load
+
+def bucket_index(start: date, end: date, granularity: str) -> Tuple[List[str], Dict[str, int]]:
+    """Aralıktaki kova etiketleri ve gün (YYYY-MM-DD) -> kova sırası eşlemesi
+    
+    Etiketler: gün için YYYY-MM-DD, hafta için haftanın pazartesisi, ay için YYYY-MM.
+    """
+    labels, positions = [], {}
+    day = start
+    while day <= end:
+        if granularity == "month":
+            label = day.isoformat()[:7]
+        elif granularity == "week":
+            label = (day - timedelta(days=day.weekday())).isoformat()
+        else:
+            label = day.isoformat()
+        if not labels or labels[-1] != label:
+            labels.append(label)
+        positions[day.isoformat()] = len(labels) - 1
+        day += timedelta(days=1)
+    return labels, positions
+
+PRODUCT_REPORT_SORT_PATTERN = "^(revenue|quantity)$"
+
+async def aggregate_product_totals(scope: dict, lower: str, upper: str) -> list:
+    """Sale.items üzerinden (plasiyer, ürün, ay) bazında miktar/ciro; sale_date in [lower, upper)"""
+    groups = await db.sales.aggregate([
+        {"$match": {**scope, "sale_date": {"$gte": lower, "$lt": upper}}},
+        {"$project": {"_id": 0, "salesperson_id": 1, "sale_date": 1, "items": 1}},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {
+                "salesperson_id": "$salesperson_id",
+                "product_id": "$items.product_id",
+                "month": {"$substrCP": ["$sale_date", 0, 7]}
+            },
+            "product_name": {"$last": "$items.product_name"},
+            "quantity": {"$sum": "$items.quantity"},
+            "revenue": {"$sum": "$items.total"},
+            "line_count": {"$sum": 1}
+        }}
+    ]).to_list(None)
+    return [{**group.pop("_id"), **group} for group in groups]
+
 @api_router.get("/reports/sales")
-async def get_sales_report(start_date: str = None, end_date: str = None, current_user: dict = Depends(get_current_user)):
-    query = {}
-    if current_user["role"] == "salesperson":
-        query["salesperson_id"] = current_user["id"]
-    elif current_user["role"] == "regional_manager":
-        team_users = await db.users.find({"region_id": current_user.get("region_id"), "role": "salesperson"}, {"_id": 0}).to_list(100)
-        team_ids = [u["id"] for u in team_users]
-        query["salesperson_id"] = {"$in": team_ids}
+async def get_sales_report(
+    start_date: str = None,
+    end_date: str = None,
+    output_format: str = Query("json", alias="format", pattern=REPORT_FORMAT_PATTERN),
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = await report_scope_query(current_user)
     
     if start_date:
         query["sale_date"] = {"$gte": start_date}
@@ -1037,8 +3390,20 @@ async def get_sales_report(start_date: str = None, end_date: str = None, current
         else:
             query["sale_date"] = {"$lte": end_date}
     
-    sales = await db.sales.find(query, {"_id": 0}).to_list(10000)
+    selected = parse_fields(fields, Sale)
+    projection, hidden = {"_id": 0}, ()
+    if selected is not None:
+        projection, hidden = trusted_serializer(Sale, (), selected).projection_with("total_amount")
+    
+    if output_format != "json":
+        return stream_report(
+            "sales", db.sales.find(query, projection), output_format,
+            amount_field="total_amount", fields=selected, hidden=hidden
+        )
+    
+    sales = await db.sales.find(query, projection).to_list(10000)
     total_amount = sum([s["total_amount"] for s in sales])
+    sales = [drop_hidden(s, hidden) for s in sales]
     
     return {
         "sales": sales,
@@ -1047,14 +3412,14 @@ async def get_sales_report(start_date: str = None, end_date: str = None, current
     }
 
 @api_router.get("/reports/visits")
-async def get_visits_report(start_date: str = None, end_date: str = None, current_user: dict = Depends(get_current_user)):
-    query = {}
-    if current_user["role"] == "salesperson":
-        query["salesperson_id"] = current_user["id"]
-    elif current_user["role"] == "regional_manager":
-        team_users = await db.users.find({"region_id": current_user.get("region_id"), "role": "salesperson"}, {"_id": 0}).to_list(100)
-        team_ids = [u["id"] for u in team_users]
-        query["salesperson_id"] = {"$in": team_ids}
+async def get_visits_report(
+    start_date: str = None,
+    end_date: str = None,
+    output_format: str = Query("json", alias="format", pattern=REPORT_FORMAT_PATTERN),
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = await report_scope_query(current_user)
     
     if start_date:
         query["visit_date"] = {"$gte": start_date}
@@ -1064,13 +3429,146 @@ async def get_visits_report(start_date: str = None, end_date: str = None, curren
         else:
             query["visit_date"] = {"$lte": end_date}
     
-    visits = await db.visits.find(query, {"_id": 0, "photo_base64": 0}).to_list(10000)
+    selected = parse_fields(fields, Visit, ("photo_base64",))
+    projection = {"_id": 0, "photo_base64": 0}
+    if selected is not None:
+        projection = trusted_serializer(Visit, ("photo_base64",), selected).projection
+    
+    if output_format != "json":
+        return stream_report("visits", db.visits.find(query, projection), output_format, fields=selected)
+    
+    visits = await db.visits.find(query, projection).to_list(10000)
     
     return {
         "visits": visits,
         "total_count": len(visits)
     }
 
+@api_router.get("/reports/timeseries")
+async def get_timeseries_report(
+    granularity: str = Query("month", pattern=TIMESERIES_GRANULARITY_PATTERN),
+    group_by: Optional[str] = Query(None, pattern=TIMESERIES_GROUP_PATTERN),
+    start_date: str = None,
+    end_date: str = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Gün/hafta/ay kovalarında satış ve tahsilat serileri (kolon bazlı)
+    
+    Yanıt: {"buckets": [...], "series": [{"key": ..., "sales_count": [...], ...}]}
+    Her seri dizisi buckets ile aynı uzunluktadır. group_by verilmezse tek seri (key: null);
+    payment_method sadece tahsilatlarda olduğundan bu gruplamada satış dizileri dönmez.
+    """
+    start, end = parse_report_range(start_date, end_date)
+    scope = await report_scope_query(current_user)
+    scope_key = response_cache_key("timeseries", current_user)
+    months = month_range(start, end)
+    sources = ("collections",) if group_by == "payment_method" else ("sales", "collections")
+    
+    queries = {
+        source: cached_period_rows(scope_key, source, months, daily_totals_loader(source, scope))
+        for source in sources
+    }
+    if group_by == "region":
+        queries["users"] = db.users.find({}, {"_id": 0, "id": 1, "region_id": 1}).to_list(None)
+    results = await gather_queries("timeseries", **queries)
+    user_regions = {u["id"]: u.get("region_id") for u in results.get("users", [])}
+    
+    labels, positions = bucket_index(start, end, granularity)
+    columns = [f"{source}_{metric}" for source in sources for metric in ("count", "amount")]
+    series = {}
+    for source in sources:
+        for row in results[source]:
+            position = positions.get(row["day"])
+            if position is None:
+                continue
+            if group_by == "salesperson":
+                key = row["salesperson_id"]
+            elif group_by == "region":
+                key = user_regions.get(row["salesperson_id"])
+            elif group_by == "payment_method":
+                key = row.get("payment_method")
+            else:
+                key = None
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = {"key": key, **{column: [0] * len(labels) for column in columns}}
+            entry[f"{source}_count"][position] += row["count"]
+            entry[f"{source}_amount"][position] += row["amount"]
+    
+    for entry in series.values():
+        for source in sources:
+            entry[f"{source}_amount"] = [round(amount, 2) for amount in entry[f"{source}_amount"]]
+    
+    return ORJSONResponse({
+        "granularity": granularity,
+        "group_by": group_by,
+        "buckets": labels,
+        "series": sorted(series.values(), key=lambda entry: (entry["key"] is None, entry["key"] or ""))
+    })
+
+@api_router.get("/reports/products")
+async def get_product_report(
+    start_date: str = None,
+    end_date: str = None,
+    group_by: Optional[str] = Query(None, pattern="^region$"),
+    sort: str = Query("revenue", pattern=PRODUCT_REPORT_SORT_PATTERN),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """Ürün performansı: satılan miktar, ciro ve satır sayısı (kolon bazlı, sort'a göre ilk limit ürün)
+    
+    Aralığın tamamen içinde kalan kapanmış aylar period_cache'ten gelir; kısmi uç aylar
+    ve içinde bulunulan ay her istekte tam tarih sınırlarıyla hesaplanır.
+    """
+    start, end = parse_report_range(start_date, end_date)
+    scope = await report_scope_query(current_user)
+    scope_key = response_cache_key("products", current_user)
+    months = month_range(start, end)
+    
+    lower, upper = start.isoformat(), (end + timedelta(days=1)).isoformat()
+    head_partial = start.day != 1
+    tail_partial = (end + timedelta(days=1)).day != 1
+    full_months = months[1 if head_partial else 0:len(months) - 1 if tail_partial else len(months)]
+    
+    async def load(first_month: str, last_month: str) -> list:
+        return await aggregate_product_totals(scope, first_month, next_month(last_month))
+    
+    queries = {}
+    if full_months:
+        queries["full"] = cached_period_rows(scope_key, "items", full_months, load)
+    if head_partial:
+        queries["head"] = aggregate_product_totals(scope, lower, min(upper, next_month(months[0])))
+    if tail_partial and (len(months) > 1 or not head_partial):
+        queries["tail"] = aggregate_product_totals(scope, max(lower, months[-1]), upper)
+    if group_by == "region":
+        queries["users"] = db.users.find({}, {"_id": 0, "id": 1, "region_id": 1}).to_list(None)
+    results = await gather_queries("product_report", **queries)
+    user_regions = {u["id"]: u.get("region_id") for u in results.get("users", [])}
+    
+    totals = {}
+    for part in ("full", "head", "tail"):
+        for row in results.get(part, []):
+            region_id = user_regions.get(row["salesperson_id"]) if group_by == "region" else None
+            key = (row["product_id"], region_id)
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = {"product_name": row["product_name"], "quantity": 0, "revenue": 0, "line_count": 0}
+            entry["quantity"] += row["quantity"]
+            entry["revenue"] += row["revenue"]
+            entry["line_count"] += row["line_count"]
+    
+    ranked = sorted(totals.items(), key=lambda item: item[1][sort], reverse=True)[:limit]
+    response = {
+        "product_id": [product_id for (product_id, _), _ in ranked],
+        "product_name": [entry["product_name"] for _, entry in ranked],
+        "quantity": [entry["quantity"] for _, entry in ranked],
+        "revenue": [round(entry["revenue"], 2) for _, entry in ranked],
+        "line_count": [entry["line_count"] for _, entry in ranked],
+    }
+    if group_by == "region":
+        response["region_id"] = [region_id for (_, region_id), _ in ranked]
+    return ORJSONResponse({"start_date": start.isoformat(), "end_date": end.isoformat(), **response})
+
 # ============ HEALTH CHECK ============
 
 @api_router.get("/health")
@@ -1083,6 +3581,19 @@ async def health_check():
         logger.error(f"Health check failed: {e}")
         return {"status": "unhealthy", "database": "disconnected"}
 
+@api_router.get("/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Cache hit/miss istatistikleri - TTL ayarı için"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
+    return {
+        "response_cache": response_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "team_cache": team_cache.stats(),
+        "period_cache": period_cache.stats(),
+        "live_dashboard": live_hub.stats()
+    }
+
 # NOT: /api/init endpoint'i KALDIRILDI - Güvenlik riski!
 # Admin kullanıcı oluşturmak için güvenli bir yöntem kullanın (örn: CLI script veya environment variable ile)
 
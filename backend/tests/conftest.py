@@ -0,0 +1,19 @@
+"""
+PediZone CRM - Birim testleri için ortak ayarlar
+Testler MongoDB'ye bağlanmaz; veritabanı gereken yerlerde server.db sahte koleksiyonlarla değiştirilir.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    """Worker başına bellek içi cache'ler testler arasında taşınmasın"""
+    import server
+    for cache in (server.response_cache, server.user_cache, server.team_cache, server.period_cache):
+        cache.clear()
+    server.team_cache_version.update(version=None, checked_at=0.0)
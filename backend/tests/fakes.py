@@ -0,0 +1,178 @@
+"""Testler için bellek içi Motor benzeri koleksiyonlar - sadece server.py'nin kullandığı sorgu alt kümesi"""
+
+import copy
+from types import SimpleNamespace
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+def matches_condition(value, condition) -> bool:
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$not":
+            if matches_condition(value, operand):
+                return False
+        elif operator == "$exists":
+            if (value is not None) != operand:
+                return False
+        elif operator == "$in":
+            if value not in operand:
+                return False
+        elif operator == "$ne":
+            if value == operand:
+                return False
+        elif value is None:
+            return False
+        elif operator == "$gt" and not value > operand:
+            return False
+        elif operator == "$gte" and not value >= operand:
+            return False
+        elif operator == "$lt" and not value < operand:
+            return False
+        elif operator == "$lte" and not value <= operand:
+            return False
+    return True
+
+def matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif field == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not matches_condition(doc.get(field), condition):
+            return False
+    return True
+
+def project(doc: dict, projection) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        return {field: doc[field] for field in included if field in doc}
+    return {field: value for field, value in doc.items() if projection.get(field, 1)}
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+    
+    def sort(self, key, direction=None):
+        keys = key if isinstance(key, list) else [(key, direction or 1)]
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda doc: doc.get(field), reverse=order == -1)
+        return self
+    
+    def limit(self, count):
+        if count:
+            self.docs = self.docs[:count]
+        return self
+    
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+    
+    def __aiter__(self):
+        async def iterate():
+            for doc in self.docs:
+                yield doc
+        return iterate()
+
+class FakeCollection:
+    def __init__(self, docs=(), unique=(), aggregate_result=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.unique = [tuple(fields) if isinstance(fields, (tuple, list)) else (fields,) for fields in unique]
+        self.aggregate_result = list(aggregate_result)
+        self.operations = []
+        self.inserted = 0
+        self.name = None
+    
+    def aggregate(self, pipeline):
+        return FakeCursor(self.aggregate_result)
+    
+    def find(self, query=None, projection=None, **kwargs):
+        return FakeCursor(project(doc, projection) for doc in self.docs if matches(doc, query or {}))
+    
+    async def find_one(self, query=None, projection=None, **kwargs):
+        for doc in self.docs:
+            if matches(doc, query or {}):
+                return project(doc, projection)
+        return None
+    
+    async def count_documents(self, query):
+        return sum(1 for doc in self.docs if matches(doc, query))
+    
+    async def insert_one(self, doc):
+        for fields in self.unique:
+            key = tuple(doc.get(field) for field in fields)
+            if any(tuple(existing.get(field) for field in fields) == key for existing in self.docs):
+                raise DuplicateKeyError(f"duplicate key: {fields}")
+        self.docs.append(copy.deepcopy(doc))
+        self.inserted += 1
+        return SimpleNamespace(inserted_id=doc.get("id"))
+    
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            try:
+                await self.insert_one(doc)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+    
+    async def update_one(self, query, update, upsert=False):
+        def apply(doc):
+            doc.update(copy.deepcopy(update.get("$set", {})))
+            for field, amount in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + amount
+        
+        for doc in self.docs:
+            if matches(doc, query):
+                apply(doc)
+                return SimpleNamespace(modified_count=1, upserted_id=None)
+        if upsert:
+            # Eşitlik koşulları yeni dokümana kopyalanır
+            doc = {field: value for field, value in query.items() if not field.startswith("$") and not isinstance(value, dict)}
+            apply(doc)
+            await self.insert_one(doc)
+            return SimpleNamespace(modified_count=0, upserted_id=doc.get("_id", doc.get("id")))
+        return SimpleNamespace(modified_count=0, upserted_id=None)
+    
+    async def find_one_and_delete(self, query, projection=None):
+        for index, doc in enumerate(self.docs):
+            if matches(doc, query):
+                del self.docs[index]
+                return project(doc, projection)
+        return None
+    
+    async def delete_one(self, query):
+        for index, doc in enumerate(self.docs):
+            if matches(doc, query):
+                del self.docs[index]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+    
+    async def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+        return SimpleNamespace(upserted_ids={})
+
+class FakeDatabase:
+    def __init__(self, **collections):
+        # "collections" server.py'de bir koleksiyon adı; iç sözlük çakışmasın
+        self._collections = collections
+        for name, collection in collections.items():
+            collection.name = name
+    
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._collections:
+            self._collections[name] = FakeCollection()
+            self._collections[name].name = name
+        return self._collections[name]
+    
+    def __getitem__(self, name):
+        return getattr(self, name)
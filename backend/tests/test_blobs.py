@@ -0,0 +1,182 @@
+"""Blob indirme: Range ayrıştırma, 304/206/416 dalları, Content-Disposition ve inline içerik taşıma"""
+
+import asyncio
+import base64
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from starlette.requests import Request
+
+import server
+from fakes import FakeCollection, FakeDatabase
+
+CONTENT = bytes(range(256)) * 4
+BLOB_HASH = hashlib.sha256(CONTENT).hexdigest()
+META = {"hash": BLOB_HASH, "size": len(CONTENT), "content_type": "application/pdf"}
+ETAG = f'"{BLOB_HASH}"'
+
+@pytest.fixture(autouse=True)
+def local_blob_store(tmp_path, monkeypatch):
+    store = server.LocalBlobStore(tmp_path)
+    store.write_file(BLOB_HASH, CONTENT)
+    monkeypatch.setattr(server, "blob_store", store)
+
+def make_request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": f"/api/blobs/{BLOB_HASH}",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+def read_body(response) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+# ============ RANGE PARSING ============
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    (" bytes=10-10 ", (10, 10)),
+    ("bytes=-", None),
+    ("bytes=0-1,5-9", None),
+    ("items=0-10", None),
+    ("", None),
+])
+def test_parse_range_header(header, expected):
+    assert server.parse_range_header(header, 1024) == expected
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=2000-3000", "bytes=50-10"])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(HTTPException) as excinfo:
+        server.parse_range_header(header, 1024)
+    assert excinfo.value.status_code == 416
+    assert excinfo.value.headers["Content-Range"] == "bytes */1024"
+
+# ============ RESPONSES ============
+
+def test_full_response():
+    response = server.blob_response(make_request(), META)
+    assert response.status_code == 200
+    assert response.headers["etag"] == ETAG
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert read_body(response) == CONTENT
+
+@pytest.mark.parametrize("if_none_match", [ETAG, f'"other", {ETAG}', "*"])
+def test_not_modified(if_none_match):
+    response = server.blob_response(make_request(if_none_match=if_none_match), META)
+    assert response.status_code == 304
+    assert response.headers["etag"] == ETAG
+    assert response.body == b""
+
+def test_stale_etag_returns_content():
+    response = server.blob_response(make_request(if_none_match='"other"'), META)
+    assert response.status_code == 200
+
+def test_partial_content():
+    response = server.blob_response(make_request(range="bytes=300-309"), META)
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 300-309/{len(CONTENT)}"
+    assert response.headers["content-length"] == "10"
+    assert read_body(response) == CONTENT[300:310]
+
+def test_suffix_range():
+    response = server.blob_response(make_request(range="bytes=-24"), META)
+    assert response.status_code == 206
+    assert read_body(response) == CONTENT[-24:]
+
+def test_if_range_mismatch_ignores_range():
+    response = server.blob_response(make_request(range="bytes=0-9", if_range='"other"'), META)
+    assert response.status_code == 200
+    assert read_body(response) == CONTENT
+
+def test_if_range_match_honours_range():
+    response = server.blob_response(make_request(range="bytes=0-9", if_range=ETAG), META)
+    assert response.status_code == 206
+
+def test_unsatisfiable_range():
+    with pytest.raises(HTTPException) as excinfo:
+        server.blob_response(make_request(range=f"bytes={len(CONTENT)}-"), META)
+    assert excinfo.value.status_code == 416
+
+# ============ CONTENT-DISPOSITION ============
+
+def test_turkish_filename():
+    response = server.blob_response(make_request(), META, filename="Fiyat Listesi Ağustos.pdf")
+    assert response.headers["content-disposition"] == (
+        "attachment; filename=\"Fiyat Listesi Agustos.pdf\"; "
+        "filename*=UTF-8''Fiyat%20Listesi%20A%C4%9Fustos.pdf"
+    )
+
+def test_dotless_i_fallback():
+    assert server.content_disposition("Sığır İlaç.pdf").startswith('attachment; filename="Sigir Ilac.pdf";')
+
+def test_quotes_and_control_characters_are_replaced():
+    header = server.content_disposition('rapor "son"\r\n.pdf')
+    assert header.startswith('attachment; filename="rapor _son___.pdf";')
+    assert header.endswith("filename*=UTF-8''rapor%20%22son%22%0D%0A.pdf")
+
+def test_non_latin_filename_falls_back_to_download():
+    assert server.content_disposition("文件").startswith('attachment; filename="download";')
+
+# ============ INLINE MIGRATION ============
+
+def jpeg_with_gps() -> bytes:
+    image = Image.new("RGB", (2000, 1000), "green")
+    exif = Image.Exif()
+    exif[0x8825] = {2: (41.0, 0.0, 0.0)}  # GPSInfo: enlem
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif.tobytes())
+    return buffer.getvalue()
+
+@pytest.fixture
+def migration_db(monkeypatch):
+    photo = base64.b64encode(jpeg_with_gps()).decode()
+    fake = FakeDatabase(
+        visits=FakeCollection(docs=[
+            {"id": "v1", "photo_base64": f"data:image/jpeg;base64,{photo}"},
+            {"id": "v2", "photo_base64": base64.b64encode(b"not an image").decode()},
+        ]),
+        products=FakeCollection(docs=[{"id": "p1", "photo_base64": photo}]),
+        documents=FakeCollection(docs=[
+            {"id": "d1", "file_base64": base64.b64encode(CONTENT).decode(), "file_type": "application/pdf"}
+        ])
+    )
+    monkeypatch.setattr(server, "db", fake)
+    # Process havuzu yerine varsayılan thread havuzu
+    monkeypatch.setattr(server, "get_image_executor", lambda: None)
+    return fake
+
+def read_blob(blob_hash: str) -> bytes:
+    return server.blob_store.path_for(blob_hash).read_bytes()
+
+def test_migrated_photos_are_normalized(migration_db):
+    assert asyncio.run(server.migrate_inline_blobs()) == 3
+    
+    for doc in (migration_db.visits.docs[0], migration_db.products.docs[0]):
+        assert doc["photo_base64"] is None
+        image = Image.open(io.BytesIO(read_blob(doc["photo_blob"])))
+        assert image.size == (server.IMAGE_MAX_DIMENSION, server.IMAGE_MAX_DIMENSION // 2)
+        assert 0x8825 not in image.getexif()
+        thumbnail = Image.open(io.BytesIO(read_blob(doc["photo_thumb_blob"])))
+        assert max(thumbnail.size) == server.IMAGE_THUMBNAIL_DIMENSION
+    
+    # Geçersiz görsel olduğu gibi bırakılır
+    assert migration_db.visits.docs[1]["photo_base64"]
+    assert "photo_blob" not in migration_db.visits.docs[1]
+
+def test_migrated_documents_are_copied_as_is(migration_db):
+    asyncio.run(server.migrate_inline_blobs())
+    (document,) = migration_db.documents.docs
+    assert document["file_blob"] == BLOB_HASH and document["file_base64"] is None
+    (meta,) = [blob for blob in migration_db.blobs.docs if blob["hash"] == BLOB_HASH]
+    assert meta["content_type"] == "application/pdf"
@@ -0,0 +1,130 @@
+"""Idempotency-Key: ilk yazma, tekrar, çakışan gövde, işlenmekte olan istek, kilit devri ve iptal"""
+
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+import server
+from fakes import FakeCollection, FakeDatabase
+
+USER = {"id": "u1", "role": "salesperson"}
+
+class Payload(BaseModel):
+    amount: float
+
+class Record(BaseModel):
+    id: str
+    amount: float
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDatabase(
+        idempotency_keys=FakeCollection(unique=[("user_id", "endpoint", "key")]),
+        sales=FakeCollection(unique=["id"])
+    )
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+def writer(fake_db, calls: list, fail_after_insert=None):
+    async def handler(resource_id):
+        calls.append(resource_id)
+        record = Record(id=resource_id or "generated", amount=10)
+        await fake_db.sales.insert_one(record.model_dump())
+        if fail_after_insert is not None:
+            raise fail_after_insert
+        return record
+    return handler
+
+def run(key, payload, handler):
+    return asyncio.run(server.run_idempotent(key, "sales", USER, payload, Record, handler))
+
+def pending_record(fake_db, key: str, locked_until: datetime, resource_id: str = "r1", amount: float = 10):
+    fake_db.idempotency_keys.docs.append({
+        "user_id": USER["id"], "endpoint": "sales", "key": key,
+        "request_hash": hashlib.sha256(Payload(amount=amount).model_dump_json().encode()).hexdigest(),
+        "response": None, "resource_id": resource_id, "created_at": locked_until,
+        "lease_id": "dead-worker", "locked_until": locked_until
+    })
+
+def test_without_key_runs_handler(fake_db):
+    calls = []
+    result = run(None, Payload(amount=10), writer(fake_db, calls))
+    assert calls == [None] and result.amount == 10
+    assert fake_db.idempotency_keys.docs == []
+
+def test_first_write_then_replay(fake_db):
+    calls = []
+    first = run("k1", Payload(amount=10), writer(fake_db, calls))
+    replay = run("k1", Payload(amount=10), writer(fake_db, calls))
+    assert len(calls) == 1
+    assert replay == first.model_dump(mode="json")
+    assert fake_db.sales.inserted == 1
+
+def test_different_body_is_rejected(fake_db):
+    run("k1", Payload(amount=10), writer(fake_db, []))
+    with pytest.raises(HTTPException) as excinfo:
+        run("k1", Payload(amount=99), writer(fake_db, []))
+    assert excinfo.value.status_code == 422
+
+def test_in_flight_request_gets_conflict(fake_db):
+    pending_record(fake_db, "k1", datetime.now(timezone.utc) + timedelta(seconds=30))
+    calls = []
+    with pytest.raises(HTTPException) as excinfo:
+        run("k1", Payload(amount=10), writer(fake_db, calls))
+    assert excinfo.value.status_code == 409
+    assert calls == []
+
+def test_expired_lease_is_taken_over_with_same_resource_id(fake_db):
+    pending_record(fake_db, "k1", datetime.now(timezone.utc) - timedelta(seconds=1))
+    calls = []
+    result = run("k1", Payload(amount=10), writer(fake_db, calls))
+    assert calls == ["r1"] and result.id == "r1"
+    assert fake_db.idempotency_keys.docs[0]["response"]["id"] == "r1"
+
+def test_takeover_returns_already_written_record(fake_db):
+    pending_record(fake_db, "k1", datetime.now(timezone.utc) - timedelta(seconds=1))
+    fake_db.sales.docs.append({"id": "r1", "amount": 10})
+    calls = []
+    result = run("k1", Payload(amount=10), writer(fake_db, calls))
+    assert calls == [] and result.id == "r1"
+    assert fake_db.sales.inserted == 0
+
+@pytest.mark.parametrize("error", [asyncio.CancelledError(), RuntimeError("rollup yazılamadı")])
+def test_failure_after_insert_does_not_duplicate(fake_db, error):
+    calls = []
+    with pytest.raises(type(error)):
+        run("k1", Payload(amount=10), writer(fake_db, calls, fail_after_insert=error))
+    # Anahtar silinmez, kilit hemen düşer
+    (record,) = fake_db.idempotency_keys.docs
+    assert record["response"] is None
+    assert record["locked_until"] <= datetime.now(timezone.utc)
+    
+    result = run("k1", Payload(amount=10), writer(fake_db, calls))
+    assert len(calls) == 1
+    assert result.id == calls[0]
+    assert fake_db.sales.inserted == 1
+
+def test_failure_before_insert_releases_key(fake_db):
+    async def rejecting(resource_id):
+        raise HTTPException(status_code=400, detail="Geçersiz müşteri")
+    with pytest.raises(HTTPException):
+        run("k1", Payload(amount=10), rejecting)
+    assert fake_db.idempotency_keys.docs == []
+    # Düzeltilmiş gövde aynı anahtarla gönderilebilir
+    assert run("k1", Payload(amount=20), writer(fake_db, [])).amount == 10
+
+def test_late_insert_from_cancelled_attempt_is_reused(fake_db):
+    pending_record(fake_db, "k1", datetime.now(timezone.utc) - timedelta(seconds=1))
+    
+    async def racing(resource_id):
+        # Önceki denemenin insert'ü devirden sonra tamamlanmış
+        await fake_db.sales.insert_one({"id": resource_id, "amount": 10})
+        await fake_db.sales.insert_one({"id": resource_id, "amount": 10})
+    
+    result = run("k1", Payload(amount=10), racing)
+    assert result.id == "r1"
+    assert fake_db.sales.inserted == 1
@@ -0,0 +1,48 @@
+"""Görsel normalizasyonu: geçerli görseller, bozuk içerik ve decompression bomb"""
+
+import io
+
+import pytest
+from PIL import Image
+
+import server
+
+def encode_png(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_process_image_resizes_and_builds_thumbnail():
+    variants = server.process_image(encode_png(Image.new("RGB", (2000, 1000), "red")), 1600, 320, 82)
+    image_bytes, content_type = variants["image"]
+    assert content_type == "image/jpeg"
+    assert Image.open(io.BytesIO(image_bytes)).size == (1600, 800)
+    assert Image.open(io.BytesIO(variants["thumbnail"][0])).size == (320, 160)
+
+def test_process_image_keeps_transparency_as_png():
+    variants = server.process_image(encode_png(Image.new("RGBA", (10, 10), (0, 0, 0, 0))), 1600, 320, 82)
+    assert variants["image"][1] == "image/png"
+
+def test_process_image_rejects_garbage():
+    with pytest.raises(ValueError):
+        server.process_image(b"not an image", 1600, 320, 82)
+
+@pytest.mark.parametrize("size", [
+    (14000, 14000),  # Pillow'un MAX_IMAGE_PIXELS'ının iki katından büyük, ~24 KB
+    (11000, 11000),  # Pillow'un sadece uyardığı 1-2 kat aralığı, ~15 KB
+])
+def test_process_image_rejects_decompression_bomb(size):
+    bomb = encode_png(Image.new("1", size))
+    with pytest.raises(ValueError, match="(?i)görsel"):
+        server.process_image(bomb, 1600, 320, 82, max_pixels=50_000_000)
+
+def test_process_image_pixel_limit_is_configurable():
+    image = encode_png(Image.new("RGB", (100, 100)))
+    with pytest.raises(ValueError, match="çok büyük"):
+        server.process_image(image, 1600, 320, 82, max_pixels=5_000)
+
+def test_process_image_decodes_large_jpeg_at_reduced_scale():
+    buffer = io.BytesIO()
+    Image.new("RGB", (6400, 3200), "blue").save(buffer, format="JPEG")
+    variants = server.process_image(buffer.getvalue(), 1600, 320, 82)
+    assert Image.open(io.BytesIO(variants["image"][0])).size == (1600, 800)
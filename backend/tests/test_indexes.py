@@ -0,0 +1,36 @@
+"""Index kontrolü: $indexStats raporu ve worker'lar arasında tek seferlik periyodik çalışma"""
+
+import asyncio
+
+import pytest
+
+import server
+from fakes import FakeCollection, FakeDatabase
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    stats = [
+        {"name": "_id_", "accesses": {"ops": 10}},
+        {"name": "id_1", "accesses": {"ops": 5}},
+        {"name": "legacy_1", "accesses": {"ops": 0}},
+    ]
+    fake = FakeDatabase(app_state=FakeCollection(unique=["_id"]))
+    for name in server.INDEX_SPEC:
+        fake[name].aggregate_result = stats
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+def test_check_indexes_reports_missing_unexpected_and_unused(fake_db):
+    report = asyncio.run(server.check_indexes())
+    assert report["regions"] == {"missing": ["updated_at_1_id_1"], "unexpected": ["legacy_1"], "unused": ["legacy_1"]}
+    assert "customer_id_1" in report["customer_balances"]["missing"]
+
+def test_index_check_runs_once_per_interval_across_workers(fake_db):
+    assert asyncio.run(server.run_index_check()) is not None
+    # Aynı aralıkta ikinci worker sahiplenemez
+    assert asyncio.run(server.run_index_check()) is None
+    (state,) = fake_db.app_state.docs
+    assert state["report"]["regions"]["unused"] == ["legacy_1"]
+    
+    state["checked_at"] = "2000-01-01T00:00:00+00:00"
+    assert asyncio.run(server.run_index_check()) is not None
@@ -0,0 +1,144 @@
+"""Canlı dashboard: abone kapsamı, artış uygulama, resync, ay dönümü ve bağlantı limiti"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import server
+
+ADMIN = {"id": "a1", "role": "admin"}
+MANAGER = {"id": "m1", "role": "regional_manager", "region_id": "r1"}
+SALESPERSON = {"id": "s1", "role": "salesperson", "region_id": "r1"}
+MONTH = datetime.now(timezone.utc).strftime("%Y-%m")
+STATS = {"total_sales": 2, "total_sales_amount": 9000.0, "monthly_sales_amount": 9000.0,
+         "total_visits": 1, "commission_emoji": server.commission_emoji(9000.0)}
+
+def event(salesperson_id="s1", region_id="r1", month=MONTH, **increments):
+    return {"salesperson_id": salesperson_id, "region_id": region_id, "month": month,
+            "increments": increments or {"sales_count": 1, "sales_amount": 2000.0}}
+
+def subscriber(user=SALESPERSON) -> server.LiveSubscriber:
+    live = server.LiveSubscriber(user)
+    live.reset(STATS)
+    return live
+
+def drain(live: server.LiveSubscriber) -> list:
+    messages = []
+    while not live.queue.empty():
+        messages.append(live.queue.get_nowait())
+    return messages
+
+# ============ SCOPE ============
+
+@pytest.mark.parametrize("user, source, expected", [
+    (ADMIN, event(), True),
+    (ADMIN, event(salesperson_id=None, region_id=None), True),
+    (MANAGER, event(), True),
+    (MANAGER, event(salesperson_id="s2", region_id="r2"), False),
+    (MANAGER, event(salesperson_id=None, region_id=None), False),
+    (SALESPERSON, event(), True),
+    (SALESPERSON, event(salesperson_id="s2"), False),
+    (SALESPERSON, event(salesperson_id=None), False),
+])
+def test_wants_filters_by_scope(user, source, expected):
+    assert server.LiveSubscriber(user).wants(source) is expected
+
+def test_manager_without_region_receives_nothing():
+    assert not server.LiveSubscriber({"id": "m2", "role": "regional_manager"}).wants(event(region_id=None))
+
+# ============ OFFER ============
+
+def test_offer_applies_increments_and_queues_delta():
+    live = subscriber()
+    live.offer(event())
+    (message,) = drain(live)
+    assert message == ("delta", {
+        "increments": {"total_sales": 1, "total_sales_amount": 2000.0, "monthly_sales_amount": 2000.0},
+        "commission_emoji": server.commission_emoji(11000.0)
+    })
+    assert live.stats["total_sales_amount"] == 11000.0
+
+def test_offer_ignores_unknown_stats_and_other_scopes():
+    live = subscriber()
+    live.offer(event(customers=1))  # Plasiyer istatistiğinde total_customers yok
+    live.offer(event(salesperson_id="s2"))
+    assert drain(live) == []
+
+def test_offer_for_previous_month_skips_monthly_total():
+    live = subscriber()
+    live.offer(event(month="2000-01"))
+    ((kind, message),) = drain(live)
+    assert "monthly_sales_amount" not in message["increments"]
+    assert live.stats["monthly_sales_amount"] == 9000.0
+
+def test_stale_subscriber_drops_events():
+    live = server.LiveSubscriber(SALESPERSON)
+    live.offer(event())
+    assert drain(live) == []
+
+# ============ RESYNC ============
+
+def test_month_rollover_requests_resync():
+    live = subscriber()
+    live.offer(event(month="9999-01"))
+    assert drain(live) == [("resync", None)]
+    assert live.stale
+
+def test_full_queue_collapses_into_single_resync(monkeypatch):
+    monkeypatch.setattr(server, "LIVE_QUEUE_SIZE", 2)
+    live = subscriber()
+    for _ in range(5):
+        live.offer(event())
+    assert drain(live) == [("resync", None)]
+
+def test_request_resync_drops_pending_deltas():
+    live = subscriber()
+    live.offer(event())
+    live.request_resync()
+    assert drain(live) == [("resync", None)]
+    # Yeni snapshot gelene kadar olaylar atlanır
+    live.offer(event())
+    assert drain(live) == []
+    live.reset(STATS)
+    live.offer(event())
+    assert len(drain(live)) == 1
+
+def test_hub_counts_resyncs():
+    hub = server.LiveDashboardHub(max_connections=5)
+    live = hub.subscribe(SALESPERSON)
+    live.reset(STATS)
+    hub.dispatch(event(month="9999-01"))
+    hub.dispatch(event(month="9999-01"))
+    assert hub.stats()["resyncs"] == 1 and hub.stats()["published"] == 2
+
+# ============ CONNECTION LIMIT ============
+
+def test_subscribe_reserves_slot_up_to_limit():
+    hub = server.LiveDashboardHub(max_connections=2)
+    first, second = hub.subscribe(ADMIN), hub.subscribe(ADMIN)
+    assert first and second
+    assert hub.subscribe(ADMIN) is None
+    hub.unsubscribe(first)
+    hub.unsubscribe(first)  # Tekrar bırakmak zararsız
+    assert hub.subscribe(ADMIN) is not None
+
+def test_endpoint_reserves_and_releases_slot(monkeypatch):
+    hub = server.LiveDashboardHub(max_connections=1)
+    monkeypatch.setattr(server, "live_hub", hub)
+    token = server.create_access_token({"sub": SALESPERSON["id"]})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    
+    async def scenario():
+        response = await server.live_dashboard(credentials, SALESPERSON)
+        # Akış başlamadan ikinci bağlantı reddedilir
+        with pytest.raises(HTTPException) as excinfo:
+            await server.live_dashboard(credentials, SALESPERSON)
+        assert excinfo.value.status_code == 503
+        # Akış hiç okunmadan yanıt biterse yer background task ile bırakılır
+        await response.background()
+        assert hub.stats()["connections"] == 0
+    
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+"""Login rate limiter: GCRA kilidi, bellek deposunun tahliyesi ve SQLite deposu"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+
+def test_lockout_after_max_attempts():
+    limiter = server.RateLimiter(max_attempts=5, window_seconds=300)
+    
+    async def scenario():
+        for _ in range(5):
+            assert not await limiter.is_rate_limited("ip:admin")
+            await limiter.record_attempt("ip:admin")
+        locked = await limiter.is_rate_limited("ip:admin")
+        await limiter.reset("ip:admin")
+        return locked, await limiter.is_rate_limited("ip:admin")
+    
+    assert asyncio.run(scenario()) == (True, False)
+
+def test_retry_after_follows_emission_interval(monkeypatch):
+    limiter = server.RateLimiter(max_attempts=5, window_seconds=300)
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "time", lambda: now[0])
+    
+    async def scenario():
+        for _ in range(5):
+            await limiter.record_attempt("ip:admin")
+        waits = [await limiter.retry_after("ip:admin")]
+        now[0] += 59.5
+        waits.append(await limiter.retry_after("ip:admin"))
+        now[0] += 0.5
+        waits.append(await limiter.retry_after("ip:admin"))
+        return waits
+    
+    # Kilit 5 dakika değil, bir sonraki hak için window/max_attempts (60 sn)
+    assert asyncio.run(scenario()) == [60, 1, 0]
+
+def test_login_returns_retry_after(monkeypatch):
+    limiter = server.RateLimiter(max_attempts=5, window_seconds=300)
+    monkeypatch.setattr(server, "login_rate_limiter", limiter)
+    request = server.LoginRequest(username="admin", password="x" * 8)
+    client = Request({"type": "http", "method": "POST", "path": "/api/auth/login", "headers": [],
+                      "client": ("10.0.0.1", 1234)})
+    
+    async def scenario():
+        for _ in range(5):
+            await limiter.record_attempt("10.0.0.1:admin")
+        with pytest.raises(HTTPException) as excinfo:
+            await server.login(request, client)
+        return excinfo.value
+    
+    error = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert error.headers == {"Retry-After": "60"}
+    assert "60 saniye" in error.detail
+
+def test_expired_keys_are_evicted_behind_live_ones():
+    backend = server.MemoryRateLimitBackend(max_keys=100, sweep_interval=60)
+    backend.advance_tat("live", 0, 1000)
+    for index in range(10):
+        backend.advance_tat(f"old-{index}", 0, 10)
+    backend.advance_tat("trigger", 100, 10)  # Sweep aralığı doldu
+    assert set(backend.tats) == {"live", "trigger"}
+
+def test_capacity_eviction_keeps_active_lockouts():
+    backend = server.MemoryRateLimitBackend(max_keys=50)
+    for _ in range(5):
+        backend.advance_tat("victim", 0, 60)
+    # Rastgele kullanıcı adlarıyla tek denemelik anahtarlar depoyu doldurur
+    for index in range(500):
+        backend.advance_tat(f"random-{index}", 1, 60)
+    assert len(backend.tats) <= 50
+    assert backend.get_tat("victim") == 300
+
+def test_sqlite_backend_runs_off_the_event_loop(tmp_path):
+    limiter = server.RateLimiter(
+        max_attempts=2, window_seconds=60, backend=server.SQLiteRateLimitBackend(str(tmp_path / "limits.db"))
+    )
+    
+    async def scenario():
+        await limiter.record_attempt("ip:user")
+        await limiter.record_attempt("ip:user")
+        return await limiter.is_rate_limited("ip:user")
+    
+    assert limiter.backend.blocking
+    assert asyncio.run(scenario())
@@ -0,0 +1,129 @@
+"""Alacak yaşlandırma: ledger_day, FIFO dağıtım, sales_by_day budama ve bakiye mutabakatı"""
+
+import asyncio
+from datetime import date
+
+import pytest
+
+import server
+from fakes import FakeCollection, FakeDatabase
+
+TODAY = date(2026, 6, 30)
+
+# ============ LEDGER DAY ============
+
+@pytest.mark.parametrize("sale_date, expected", [
+    ("2026-06-15", "2026-06-15"),
+    ("2026-06-15T10:30:00+00:00", "2026-06-15"),
+    ("2024-02-29", "2024-02-29"),
+    ("2026-02-30", None),
+    ("2026-13-01", None),
+    ("15.06.2026", None),
+    ("", None),
+    (None, None),
+])
+def test_ledger_day(sale_date, expected):
+    assert server.ledger_day(sale_date) == expected
+
+# ============ FIFO AGING ============
+
+def test_age_receivable_assigns_open_balance_to_newest_sales():
+    sales_by_day = {"2026-06-20": 100, "2026-05-10": 200, "2026-03-01": 300}
+    # 600 satış, 250 tahsilat: en eski borç kapanır, açık 350 en yeni günlerden geriye dağıtılır
+    assert server.age_receivable(350, sales_by_day, TODAY) == {
+        "0-30": 100.0, "31-60": 200.0, "61-90": 0.0, "90+": 50.0
+    }
+
+def test_age_receivable_bucket_limits_are_inclusive():
+    sales_by_day = {"2026-05-31": 10, "2026-05-30": 20, "2026-04-01": 30, "2026-03-31": 40}
+    assert server.age_receivable(100, sales_by_day, TODAY) == {
+        "0-30": 10.0, "31-60": 20.0, "61-90": 30.0, "90+": 40.0
+    }
+
+def test_age_receivable_unknown_days_go_to_oldest_bucket():
+    assert server.age_receivable(80, {"2026-06-29": 30}, TODAY) == {
+        "0-30": 30.0, "31-60": 0.0, "61-90": 0.0, "90+": 50.0
+    }
+
+def test_age_receivable_skips_invalid_stored_days():
+    # Düzeltme öncesi yazılmış geçersiz gün anahtarları 500 yerine 90+ kovasına düşer
+    assert server.age_receivable(150, {"2026-06-29": 100, "2026-02-30": 50}, TODAY) == {
+        "0-30": 100.0, "31-60": 0.0, "61-90": 0.0, "90+": 50.0
+    }
+
+def test_age_receivable_closed_or_overpaid_balance_is_empty():
+    for balance in (0, -25):
+        assert set(server.age_receivable(balance, {"2026-06-29": 100}, TODAY).values()) == {0.0}
+
+# ============ PRUNING ============
+
+def test_prune_sales_by_day_keeps_newest_days_covering_balance():
+    sales_by_day = {"2026-06-20": 100, "2026-05-10": 200, "2026-03-01": 300}
+    assert server.prune_sales_by_day(250, sales_by_day) == {"2026-06-20": 100, "2026-05-10": 200}
+    assert server.prune_sales_by_day(300, sales_by_day) == {"2026-06-20": 100, "2026-05-10": 200}
+    assert server.prune_sales_by_day(0, sales_by_day) == {}
+
+def test_prune_sales_by_day_does_not_change_aging():
+    sales_by_day = {"2026-06-20": 100, "2026-05-10": 200, "2026-03-01": 300, "2025-12-01": 400}
+    pruned = server.prune_sales_by_day(350, sales_by_day)
+    assert server.age_receivable(350, pruned, TODAY) == server.age_receivable(350, sales_by_day, TODAY)
+
+# ============ REBUILD ============
+
+def test_rebuild_customer_balances(monkeypatch):
+    fake = FakeDatabase(
+        sales=FakeCollection(aggregate_result=[
+            {"_id": {"customer_id": "c1", "day": "2026-06-20"}, "amount": 100},
+            {"_id": {"customer_id": "c1", "day": "2026-03-01"}, "amount": 300},
+            {"_id": {"customer_id": "c1", "day": "2026-02-30"}, "amount": 50},
+            {"_id": {"customer_id": "c2", "day": "2026-06-01"}, "amount": 80},
+        ]),
+        collections=FakeCollection(aggregate_result=[
+            {"_id": "c1", "amount": 320},
+            {"_id": "c3", "amount": 40},
+            {"_id": "deleted", "amount": 70},
+        ]),
+        customers=FakeCollection(docs=[
+            {"id": "c1", "name": "Eczane A", "region_id": "r1"},
+            {"id": "c2", "name": "Klinik B", "region_id": "r2"},
+            {"id": "c3", "name": "Klinik C"},
+        ]),
+        customer_balances=FakeCollection()
+    )
+    monkeypatch.setattr(server, "db", fake)
+    
+    assert asyncio.run(server.rebuild_customer_balances()) == 3
+    
+    delete_all, *replaces = fake.customer_balances.operations
+    assert delete_all._filter == {}
+    docs = {op._doc["customer_id"]: op._doc for op in replaces}
+    
+    assert docs["c1"]["customer_name"] == "Eczane A"
+    assert docs["c1"]["region_id"] == "r1"
+    assert docs["c1"]["sales_amount"] == 450
+    assert docs["c1"]["balance"] == 130
+    # Geçersiz gün dağılıma girmez, kapanmış en eski gün budanır
+    assert docs["c1"]["sales_by_day"] == {"2026-06-20": 100, "2026-03-01": 300}
+    
+    assert docs["c2"]["balance"] == 80
+    assert docs["c2"]["sales_by_day"] == {"2026-06-01": 80}
+    
+    # Satışı olmayan, sadece tahsilatı olan müşteri: negatif bakiye, dağılım boş
+    assert docs["c3"]["region_id"] is None
+    assert docs["c3"]["balance"] == -40
+    assert docs["c3"]["sales_by_day"] == {}
+    
+    # Silinmiş müşterinin hareketleri bakiye üretmez
+    assert "deleted" not in docs
+
+def test_delete_customer_removes_balance(monkeypatch):
+    fake = FakeDatabase(
+        customers=FakeCollection(docs=[{"id": "c1", "name": "Eczane A", "region_id": "r1"}]),
+        customer_balances=FakeCollection(docs=[{"customer_id": "c1", "balance": 100}, {"customer_id": "c2", "balance": 5}])
+    )
+    monkeypatch.setattr(server, "db", fake)
+    server.response_cache.set(server.receivables_cache_key({"role": "admin", "id": "a1"}), "stale")
+    
+    asyncio.run(server.delete_customer("c1", current_user={"id": "a1", "role": "admin"}))
+    assert fake.customer_balances.docs == [{"customer_id": "c2", "balance": 5}]
+    assert server.response_cache.get(server.receivables_cache_key({"role": "admin", "id": "a1"})) is None
@@ -0,0 +1,143 @@
+"""Delta senkronizasyon: token doğrulama, konum sorgusu, sayfalama, güvenlik penceresi ve tombstone kapsamı"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+from fastapi import HTTPException
+
+import server
+from fakes import FakeCollection, FakeDatabase, matches
+
+SALESPERSON = {"id": "s1", "role": "salesperson", "region_id": "r1"}
+MANAGER = {"id": "m1", "role": "regional_manager", "region_id": "r1"}
+
+def ago(**delta) -> str:
+    return (datetime.now(timezone.utc) - timedelta(**delta)).isoformat()
+
+def sale(doc_id: str, salesperson_id: str = "s1", updated_at: str = None) -> dict:
+    updated_at = updated_at or ago(hours=1)
+    return server.Sale(id=doc_id, customer_id="c1", salesperson_id=salesperson_id, sale_date="2026-10-01",
+                       items=[], total_amount=100, created_at=updated_at, updated_at=updated_at).model_dump()
+
+def tombstone(doc_id: str, collection: str, updated_at: str = None, **scope) -> dict:
+    return {"id": doc_id, "collection": collection, "updated_at": updated_at or ago(minutes=30), **scope}
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDatabase()
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+def sync(user=SALESPERSON, since=None, limit=server.MAX_PAGE_SIZE) -> dict:
+    response = asyncio.run(server.get_sync_changes(since=since, limit=limit, current_user=user))
+    return orjson.loads(response.body)
+
+# ============ TOKEN ============
+
+def test_token_round_trip():
+    state = {"positions": {"sales": ["2026-10-01T00:00:00+00:00", "abc"]}, "issued_at": ago(minutes=1)}
+    assert server.decode_sync_token(server.encode_sync_token(state)) == state
+
+@pytest.mark.parametrize("token", [
+    "bm90IGpzb24",  # "not json"
+    server.encode_sync_token([]),
+    server.encode_sync_token({"positions": {}}),
+    server.encode_sync_token({"positions": [], "issued_at": "2026-10-01"}),
+    server.encode_sync_token({"positions": {"sales": ["2026-10-01"]}, "issued_at": "2026-10-01"}),
+    server.encode_sync_token({"positions": {"sales": [1, "abc"]}, "issued_at": "2026-10-01"}),
+    "!!!",
+])
+def test_invalid_token_is_rejected(token):
+    with pytest.raises(HTTPException) as excinfo:
+        server.decode_sync_token(token)
+    assert excinfo.value.status_code == 400
+
+def test_expired_token_gets_gone(fake_db):
+    issued_at = ago(days=server.TOMBSTONE_RETENTION_DAYS + 1)
+    token = server.encode_sync_token({"positions": {}, "issued_at": issued_at})
+    with pytest.raises(HTTPException) as excinfo:
+        sync(since=token)
+    assert excinfo.value.status_code == 410
+
+# ============ POSITION ============
+
+def test_after_position_breaks_ties_by_id():
+    query = server.after_position(["2026-10-01T10:00:00", "b"])
+    docs = [
+        {"id": "a", "updated_at": "2026-10-01T10:00:00"},
+        {"id": "b", "updated_at": "2026-10-01T10:00:00"},
+        {"id": "c", "updated_at": "2026-10-01T10:00:00"},
+        {"id": "a", "updated_at": "2026-10-01T10:00:01"},
+        {"id": "z", "updated_at": "2026-10-01T09:59:59"},
+    ]
+    assert [(doc["id"], doc["updated_at"][-2:]) for doc in docs if matches(doc, query)] == [("c", "00"), ("a", "01")]
+
+# ============ PAGING ============
+
+def test_full_sync_pages_through_all_changes(fake_db):
+    fake_db.sales.docs.extend(sale(f"sale-{index}", updated_at=ago(hours=1)) for index in range(5))
+    seen, pages, token = [], [], None
+    while True:
+        page = sync(since=token, limit=2)
+        seen += [doc["id"] for doc in page["changes"]["sales"]]
+        pages.append(page["has_more"])
+        token = page["next"]
+        if not page["has_more"]:
+            break
+    assert pages == [True, True, False]
+    assert seen == [f"sale-{index}" for index in range(5)]
+    # Sonraki çağrı boş döner
+    assert sync(since=token)["changes"]["sales"] == []
+
+def test_position_is_clamped_to_safety_horizon(fake_db):
+    fake_db.sales.docs.append(sale("old", updated_at=ago(hours=1)))
+    # Güvenlik penceresi içindeki kayıt: daha erken zaman damgalı eşzamanlı yazmalar henüz görünmemiş olabilir
+    fake_db.sales.docs.append(sale("recent", updated_at=ago(seconds=1)))
+    first = sync()
+    assert [doc["id"] for doc in first["changes"]["sales"]] == ["old", "recent"]
+    position = server.decode_sync_token(first["next"])["positions"]["sales"]
+    assert position[0] < ago(seconds=server.SYNC_SAFETY_SECONDS - 1) and position[1] == ""
+    # Pencere içindeki kayıt tekrar gönderilir, eskisi gönderilmez
+    assert [doc["id"] for doc in sync(since=first["next"])["changes"]["sales"]] == ["recent"]
+
+def test_full_sync_skips_tombstones(fake_db):
+    fake_db.tombstones.docs.append(tombstone("gone", "sales", salesperson_id="s1"))
+    first = sync()
+    assert first["deleted"]["sales"] == []
+    assert server.decode_sync_token(first["next"])["positions"]["tombstones"][1] == ""
+
+# ============ SCOPE ============
+
+def test_changes_are_scoped_to_salesperson(fake_db):
+    fake_db.sales.docs.extend([sale("mine"), sale("theirs", salesperson_id="s2")])
+    page = sync()
+    assert [doc["id"] for doc in page["changes"]["sales"]] == ["mine"]
+    assert "users" not in page["changes"]
+
+def test_tombstones_are_scoped(fake_db):
+    fake_db.users.docs.extend([
+        {"id": "s1", "role": "salesperson", "region_id": "r1", "is_active": True},
+        {"id": "s3", "role": "salesperson", "region_id": "r2", "is_active": True},
+    ])
+    token = server.encode_sync_token({"positions": {}, "issued_at": ago(hours=2)})
+    fake_db.tombstones.docs.extend([
+        tombstone("mine", "collections", salesperson_id="s1"),
+        tombstone("theirs", "collections", salesperson_id="s3"),
+        tombstone("c-r1", "customers", region_id="r1"),
+        tombstone("c-r2", "customers", region_id="r2"),
+        tombstone("region", "regions"),
+        tombstone("u-r1", "users", region_id="r1"),
+    ])
+    
+    salesperson = sync(since=token)["deleted"]
+    assert salesperson["collections"] == ["mine"]
+    assert sorted(salesperson["customers"]) == ["c-r1", "c-r2"]
+    assert salesperson["regions"] == ["region"]
+    assert "users" not in salesperson
+    
+    manager = sync(MANAGER, since=token)["deleted"]
+    assert manager["collections"] == ["mine"]
+    assert manager["customers"] == ["c-r1"]
+    assert manager["users"] == ["u-r1"]
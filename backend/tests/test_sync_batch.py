@@ -0,0 +1,62 @@
+"""Offline toplu senkronizasyon: client_id ile tekrar gönderimler kayıt ve yan etki çoğaltmaz"""
+
+import asyncio
+
+import pytest
+
+import server
+from fakes import FakeCollection, FakeDatabase
+
+USER = {"id": "u1", "role": "salesperson", "region_id": "r1"}
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDatabase(
+        sales=FakeCollection(unique=["id"]),
+        collections=FakeCollection(unique=["id"]),
+        visits=FakeCollection(unique=["id"])
+    )
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+def sale(client_id=None, amount=100.0):
+    item = {
+        "customer_id": "c1", "sale_date": "2026-10-01", "total_amount": amount,
+        "items": [{"product_id": "p1", "product_name": "Krem", "quantity": 1, "unit_price": amount, "total": amount}]
+    }
+    return {**item, "client_id": client_id} if client_id else item
+
+def sync(**kinds):
+    return asyncio.run(server.sync_batch(server.SyncBatch(**kinds), current_user=USER))
+
+def test_replayed_batch_is_reported_as_duplicate(fake_db):
+    first = sync(sales=[sale("device-1"), sale("device-2")])
+    assert [result["status"] for result in first["sales"]] == ["created", "created"]
+    rollup_writes = len(fake_db.sales_rollups.operations)
+    
+    replay = sync(sales=[sale("device-1"), sale("device-2"), sale("device-3")])
+    assert [result["status"] for result in replay["sales"]] == ["duplicate", "duplicate", "created"]
+    assert [result["id"] for result in replay["sales"][:2]] == [result["id"] for result in first["sales"]]
+    assert (replay["created"], replay["duplicate"], replay["failed"]) == (1, 2, 0)
+    assert fake_db.sales.inserted == 3
+    # Rollup artışı sadece yeni kayıt için yazıldı
+    (operation,) = fake_db.sales_rollups.operations[rollup_writes:]
+    assert operation._doc["$inc"] == {"sales_count": 1, "sales_amount": 100.0}
+
+def test_same_client_id_within_batch_is_written_once(fake_db):
+    result = sync(sales=[sale("device-1"), sale("device-1")])
+    assert [item["status"] for item in result["sales"]] == ["created", "duplicate"]
+    assert fake_db.sales.inserted == 1
+
+def test_client_ids_are_scoped_per_user():
+    assert server.sync_record_id("u1", "device-1") == server.sync_record_id("u1", "device-1")
+    assert server.sync_record_id("u1", "device-1") != server.sync_record_id("u2", "device-1")
+
+def test_items_without_client_id_and_invalid_items(fake_db):
+    result = sync(sales=[sale(), {"customer_id": "c1"}], collections=[
+        {"customer_id": "c1", "amount": 50, "collection_date": "2026-10-02", "payment_method": "nakit",
+         "client_id": "device-9"}
+    ])
+    assert [item["status"] for item in result["sales"]] == ["created", "error"]
+    assert result["collections"][0]["id"] == server.sync_record_id("u1", "device-9")
+    assert (result["created"], result["duplicate"], result["failed"]) == (2, 0, 1)
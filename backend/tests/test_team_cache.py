@@ -0,0 +1,46 @@
+"""Bölge ekip cache'i: başka worker'daki kullanıcı yazmaları cache_versions sayacıyla görülür"""
+
+import asyncio
+
+import pytest
+
+import server
+from fakes import FakeCollection, FakeDatabase
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDatabase(users=FakeCollection(docs=[
+        {"id": "s1", "role": "salesperson", "region_id": "r1"},
+        {"id": "m1", "role": "regional_manager", "region_id": "r1"},
+    ]))
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+def team(region_id="r1") -> list:
+    return asyncio.run(server.get_team_ids(region_id))
+
+def other_worker_adds(fake_db, user: dict):
+    """Başka bir worker'ın create_user'ı: kayıt + sayaç artışı, bu worker'ın cache'ine dokunmaz"""
+    fake_db.users.docs.append(user)
+    asyncio.run(fake_db.cache_versions.update_one({"_id": "teams"}, {"$inc": {"version": 1}}, upsert=True))
+
+def test_team_is_cached(fake_db):
+    assert team() == ["s1"]
+    fake_db.users.docs.append({"id": "s2", "role": "salesperson", "region_id": "r1"})
+    assert team() == ["s1"]
+
+def test_write_on_other_worker_is_seen_after_version_check(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "REFERENCE_CACHE_CHECK_SECONDS", 3600)
+    assert team() == ["s1"]
+    other_worker_adds(fake_db, {"id": "s2", "role": "salesperson", "region_id": "r1"})
+    # Kontrol aralığı dolmadan yerel kopya kullanılır
+    assert team() == ["s1"]
+    server.team_cache_version["checked_at"] = 0.0
+    assert team() == ["s1", "s2"]
+
+def test_local_invalidation_bumps_shared_version(fake_db):
+    assert team() == ["s1"]
+    fake_db.users.docs.append({"id": "s2", "role": "salesperson", "region_id": "r1"})
+    asyncio.run(server.invalidate_team_cache())
+    assert team() == ["s1", "s2"]
+    assert fake_db.cache_versions.docs == [{"_id": "teams", "version": 1}]
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+PediZone CRM Backend Performance Benchmarks
+Measures latency of the running API under load.
+
+Usage:
+    python3 backend_benchmark.py login-load [BASE_URL]
+    python3 backend_benchmark.py serialization [ITEMS]
+"""
+
+import os
+import sys
+import time
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import json
+import uuid
+
+import requests
+
+# Base configuration
+BASE_URL = os.environ.get("BENCH_BASE_URL", "http://localhost:8080/api")
+ADMIN_CREDENTIALS = {
+    "username": os.environ.get("BENCH_USERNAME", "admin"),
+    "password": os.environ.get("BENCH_PASSWORD", "Admin123!"),
+}
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of latency samples in milliseconds"""
+    ordered = sorted(samples_ms)
+    def pick(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+def print_row(label: str, stats: Dict[str, float]):
+    print(
+        f"  {label:<22} n={stats['n']:<5} mean={stats['mean']:7.1f}ms  p50={stats['p50']:7.1f}ms  "
+        f"p95={stats['p95']:7.1f}ms  p99={stats['p99']:7.1f}ms  max={stats['max']:7.1f}ms"
+    )
+
+class LoginLoadBenchmark:
+    """p99 latency of an unrelated endpoint while logins (bcrypt) run concurrently"""
+
+    def __init__(self, base_url: str, probe_requests: int = 300, login_threads: int = 8):
+        self.base_url = base_url
+        self.probe_requests = probe_requests
+        self.login_threads = login_threads
+        print(f"🔧 Login load benchmark against {self.base_url}")
+
+    def probe(self, session: requests.Session, headers: Dict[str, str], count: int) -> List[float]:
+        samples = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = session.get(f"{self.base_url}/auth/me", headers=headers)
+            samples.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+        return samples
+
+    def login_loop(self, stop: threading.Event, counter: List[int]):
+        session = requests.Session()
+        while not stop.is_set():
+            response = session.post(f"{self.base_url}/auth/login", json=ADMIN_CREDENTIALS)
+            if response.status_code == 200:
+                counter.append(1)
+
+    def run(self):
+        session = requests.Session()
+        login = session.post(f"{self.base_url}/auth/login", json=ADMIN_CREDENTIALS)
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        self.probe(session, headers, 20)  # warm-up
+        idle = self.probe(session, headers, self.probe_requests)
+
+        stop = threading.Event()
+        logins: List[int] = []
+        with ThreadPoolExecutor(max_workers=self.login_threads) as pool:
+            for _ in range(self.login_threads):
+                pool.submit(self.login_loop, stop, logins)
+            started = time.perf_counter()
+            loaded = self.probe(session, headers, self.probe_requests)
+            elapsed = time.perf_counter() - started
+            stop.set()
+
+        print("\n📊 GET /auth/me latency")
+        print_row("idle", percentiles(idle))
+        print_row(f"{self.login_threads} login threads", percentiles(loaded))
+        print(f"  logins completed: {len(logins)} ({len(logins) / elapsed:.1f}/s)\n")
+
+class SerializationBenchmark:
+    """Per-item cost of list response serialization: response_model validation vs trusted orjson path"""
+
+    def __init__(self, items: int = 10000, rounds: int = 5):
+        self.items = items
+        self.rounds = rounds
+        print(f"🔧 Serialization benchmark: {items} sales x {rounds} rounds")
+
+    def sample_sales(self) -> List[dict]:
+        return [
+            {
+                "id": str(uuid.uuid4()),
+                "customer_id": str(uuid.uuid4()),
+                "salesperson_id": str(uuid.uuid4()),
+                "sale_date": "2026-01-15",
+                "items": [
+                    {"product_id": str(uuid.uuid4()), "product_name": f"Ürün {j}",
+                     "quantity": 2.0, "unit_price": 125.5, "total": 251.0}
+                    for j in range(3)
+                ],
+                "total_amount": 753.0,
+                "notes": "Saha satışı",
+                "created_at": "2026-01-15T10:00:00+00:00",
+            }
+            for _ in range(self.items)
+        ]
+
+    def measure(self, fn, docs) -> float:
+        best = float("inf")
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            fn(docs)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def run(self):
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        from pydantic import TypeAdapter
+        from fastapi.responses import ORJSONResponse
+        from server import Sale, trusted_serializer
+
+        docs = self.sample_sales()
+        adapter = TypeAdapter(List[Sale])
+        serializer = trusted_serializer(Sale)
+
+        def validated(batch):
+            # FastAPI response_model yolu: validate -> serialize(mode=json) -> json.dumps
+            value = adapter.validate_python(batch)
+            json.dumps(adapter.dump_python(value, mode="json"), ensure_ascii=False).encode("utf-8")
+
+        def trusted(batch):
+            ORJSONResponse(serializer.prepare(batch)).body
+
+        old = self.measure(validated, docs)
+        new = self.measure(trusted, docs)
+        print("\n📊 List serialization (best of rounds)")
+        print(f"  response_model + json   total={old * 1000:8.1f}ms  per item={old / self.items * 1e6:6.2f}µs")
+        print(f"  trusted + orjson        total={new * 1000:8.1f}ms  per item={new / self.items * 1e6:6.2f}µs")
+        print(f"  speedup: {old / new:.1f}x\n")
+
+BENCHMARKS = {
+    "login-load": lambda args: LoginLoadBenchmark(args[0] if args else BASE_URL).run(),
+    "serialization": lambda args: SerializationBenchmark(int(args[0]) if args else 10000).run(),
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python3 backend_benchmark.py [{'|'.join(BENCHMARKS)}] [args...]")
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](sys.argv[2:])
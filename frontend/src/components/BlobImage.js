@@ -0,0 +1,40 @@
+import React, { useState, useEffect } from 'react';
+import { axiosInstance } from '@/App';
+
+// Blob deposundaki görseli yetkili istekle indirip gösterir.
+// blob yoksa (eski kayıtlar) fallbackSrc (inline base64) kullanılır.
+const BlobImage = ({ blob, fallbackSrc, alt, className }) => {
+  const [src, setSrc] = useState(blob ? null : fallbackSrc);
+
+  useEffect(() => {
+    if (!blob) {
+      setSrc(fallbackSrc);
+      return;
+    }
+
+    let objectUrl = null;
+    let cancelled = false;
+    axiosInstance
+      .get(`/blobs/${blob}`, { responseType: 'blob' })
+      .then((response) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(response.data);
+        setSrc(objectUrl);
+      })
+      .catch(() => {
+        if (!cancelled) setSrc(fallbackSrc);
+      });
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [blob, fallbackSrc]);
+
+  if (!src) {
+    return <div className={`${className || ''} bg-gray-100 animate-pulse`} />;
+  }
+  return <img src={src} alt={alt} className={className} />;
+};
+
+export default BlobImage;
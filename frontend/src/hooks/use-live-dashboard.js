@@ -0,0 +1,70 @@
+import { useEffect } from 'react';
+import { API } from '@/App';
+
+const RETRY_DELAYS = [1000, 2000, 5000, 10000, 30000];
+
+// /live/dashboard SSE akışını dinler. EventSource Authorization başlığı gönderemediği için
+// fetch + ReadableStream ile okunur. snapshot: tam istatistik, delta: alanlara eklenecek artışlar.
+// Bağlantı koparsa artan aralıklarla yeniden bağlanır; her bağlantı yeni bir snapshot ile başlar.
+const useLiveDashboard = ({ onSnapshot, onDelta, onUnavailable }) => {
+  useEffect(() => {
+    const controller = new AbortController();
+    let attempt = 0;
+    let retryTimer = null;
+
+    const handleEvent = (block) => {
+      let event = 'message';
+      const data = [];
+      block.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+      });
+      if (data.length === 0) return; // keepalive yorumu
+      const payload = JSON.parse(data.join('\n'));
+      if (event === 'snapshot') onSnapshot(payload);
+      else if (event === 'delta') onDelta(payload);
+    };
+
+    const connect = async () => {
+      try {
+        const response = await fetch(`${API}/live/dashboard`, {
+          headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+          signal: controller.signal,
+        });
+        if (!response.ok || !response.body) {
+          // 401: oturum bitti; 503: worker bağlantı limiti dolu - tek seferlik yükleme ile devam
+          onUnavailable?.(response.status);
+          if (response.status === 401 || response.status === 503) return;
+          throw new Error(`HTTP ${response.status}`);
+        }
+        attempt = 0;
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          let boundary;
+          while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            handleEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+      }
+      if (controller.signal.aborted) return;
+      retryTimer = setTimeout(connect, RETRY_DELAYS[Math.min(attempt, RETRY_DELAYS.length - 1)]);
+      attempt += 1;
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      clearTimeout(retryTimer);
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+};
+
+export default useLiveDashboard;
@@ -6,6 +6,7 @@ import { axiosInstance } from '@/App';
 import { toast } from 'sonner';
 import { TrendingUp, Users as UsersIcon, FileText, Wallet, Target, X } from 'lucide-react';
 import VisitMap from '@/components/VisitMap';
+import useLiveDashboard from '@/hooks/use-live-dashboard';
 
 const Dashboard = ({ user, setUser }) => {
   const navigate = useNavigate();
@@ -17,10 +18,29 @@ const Dashboard = ({ user, setUser }) => {
   const [showPerformanceModal, setShowPerformanceModal] = useState(false);
 
   useEffect(() => {
-    fetchStats();
     fetchMapData();
   }, []);
 
+  // İstatistikler canlı akıştan gelir; akış kullanılamazsa tek seferlik yükleme
+  useLiveDashboard({
+    onSnapshot: (snapshot) => {
+      setStats(snapshot);
+      setLoading(false);
+    },
+    onDelta: ({ increments, commission_emoji }) => {
+      setStats((prev) => {
+        if (!prev) return prev;
+        const next = { ...prev };
+        Object.entries(increments).forEach(([field, value]) => {
+          next[field] = (next[field] || 0) + value;
+        });
+        if (commission_emoji) next.commission_emoji = commission_emoji;
+        return next;
+      });
+    },
+    onUnavailable: () => fetchStats(),
+  });
+
   const fetchStats = async () => {
     try {
       const response = await axiosInstance.get('/dashboard/stats');
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import Layout from '@/components/Layout';
 import PageHeader from '@/components/PageHeader';
+import BlobImage from '@/components/BlobImage';
 import { axiosInstance } from '@/App';
 import { toast } from 'sonner';
 import { Button } from '@/components/ui/button';
@@ -291,9 +292,10 @@ const ProductsPage = ({ user, setUser }) => {
             >
               {/* Product Image */}
               <div className="relative h-32 bg-gray-100">
-                {product.photo_base64 ? (
-                  <img 
-                    src={product.photo_base64} 
+                {product.photo_blob || product.photo_base64 ? (
+                  <BlobImage
+                    blob={product.photo_thumb_blob || product.photo_blob}
+                    fallbackSrc={product.photo_base64}
                     alt={product.name}
                     className="w-full h-full object-cover"
                   />
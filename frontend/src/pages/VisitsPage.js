@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import Layout from '@/components/Layout';
+import BlobImage from '@/components/BlobImage';
 import { axiosInstance } from '@/App';
 import { toast } from 'sonner';
 import { Button } from '@/components/ui/button';
@@ -386,7 +387,7 @@ const VisitsPage = ({ user, setUser }) => {
                     )}
                     <td className="px-6 py-4 text-sm text-gray-700">{visit.notes ? visit.notes.substring(0, 50) : '-'}</td>
                     <td className="px-6 py-4 text-center">
-                      {visit.photo_base64 ? (
+                      {visit.photo_blob || visit.photo_base64 ? (
                         <span className="inline-flex items-center px-2 py-1 rounded-full text-xs bg-green-50 text-green-700">
                           <Camera size={12} className="mr-1" /> Var
                         </span>
@@ -459,10 +460,10 @@ const VisitsPage = ({ user, setUser }) => {
                   <p className="text-gray-900">Enlem: {selectedVisit.latitude}, Boylam: {selectedVisit.longitude}</p>
                 </div>
               )}
-              {selectedVisit.photo_base64 && (
+              {(selectedVisit.photo_blob || selectedVisit.photo_base64) && (
                 <div>
                   <p className="text-sm text-gray-500 mb-2">Fotoğraf</p>
-                  <img src={selectedVisit.photo_base64} alt="Ziyaret" className="w-full rounded-lg" />
+                  <BlobImage blob={selectedVisit.photo_blob} fallbackSrc={selectedVisit.photo_base64} alt="Ziyaret" className="w-full rounded-lg" />
                 </div>
               )}
             </div>